@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark bytes-on-wire and CPU cost of response serialization and compression.
+
+Builds payloads shaped like the real API responses (a single large paste and
+the admin paste list) and compares the stdlib and orjson JSON providers, then
+every available content encoding, including precompressed cache hits.
+
+    python benchmarks/bench_compression.py
+"""
+
+import os
+import random
+import string
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from snipserve import create_app, compression
+from snipserve.json_provider import StdlibJSONProvider, OrjsonProvider, orjson
+
+
+def make_paste(i, content_lines):
+    words = [''.join(random.choices(string.ascii_lowercase, k=random.randint(2, 9))) for _ in range(200)]
+    content = '\n'.join(
+        '    ' * random.randint(0, 3) + ' '.join(random.choices(words, k=random.randint(3, 12)))
+        for _ in range(content_lines)
+    )
+    return {
+        'id': f'paste{i:03d}',
+        'title': f'Paste number {i}',
+        'content': content,
+        'created_at': datetime(2024, 1, 1) + timedelta(minutes=i),
+        'hidden': bool(i % 2),
+        'user_id': i % 10,
+        'username': f'user{i % 10}',
+        'view_count': i * 7,
+    }
+
+
+def timeit(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def bench_json(app, name, payload, repeat):
+    print(f'\n== JSON: {name} ==')
+    providers = [('stdlib', StdlibJSONProvider(app))]
+    if orjson is not None:
+        providers.append(('orjson', OrjsonProvider(app)))
+    for provider_name, provider in providers:
+        with app.app_context():
+            ms, response = timeit(lambda: provider.response(payload), repeat)
+        print(f'{provider_name:>8}: {ms:8.3f} ms/response  {len(response.get_data()):>10} bytes')
+
+
+def bench_encodings(name, data, repeat):
+    print(f'\n== Compression: {name} ({len(data)} bytes) ==')
+    for encoding in compression.ENCODERS:
+        ms, compressed = timeit(lambda: compression.compress(data, encoding), repeat)
+        compression.compress(data, encoding, cache=True)
+        hit_ms, _ = timeit(lambda: compression.compress(data, encoding, cache=True), repeat)
+        ratio = len(compressed) / len(data) * 100
+        print(f'{encoding:>8}: {ms:8.3f} ms  {len(compressed):>10} bytes ({ratio:5.1f}%)  cached: {hit_ms:.3f} ms')
+
+
+def main():
+    app = create_app()
+    random.seed(42)
+    big_paste = make_paste(0, content_lines=40000)
+    paste_list = [make_paste(i, content_lines=40) for i in range(500)]
+
+    bench_json(app, 'single large paste', big_paste, repeat=20)
+    bench_json(app, 'admin paste list (500 pastes)', paste_list, repeat=20)
+
+    with app.app_context():
+        bench_encodings('single large paste', app.json.response(big_paste).get_data(), repeat=5)
+        bench_encodings('admin paste list', app.json.response(paste_list).get_data(), repeat=5)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark revision storage overhead and reconstruction latency.
+
+Creates a paste and applies a series of small random line edits to it, saving
+a revision for each like update_paste does. Reports the bytes stored for all
+revisions against keeping a full copy of every version, and how long it takes
+to rebuild revisions from their snapshot and deltas:
+
+    python benchmarks/bench_revisions.py --lines 2000 --edits 500 --snapshot-interval 20
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+
+from sqlalchemy import func, select
+from snipserve import create_app, db, config, revisions
+from snipserve.models import User, Paste, PasteRevision
+
+
+def edit(lines, rng):
+    """Change, insert or delete a few lines"""
+    for _ in range(rng.randint(1, 3)):
+        i = rng.randrange(len(lines))
+        action = rng.random()
+        if action < 0.6:
+            lines[i] = f'changed line {rng.random()}\n'
+        elif action < 0.8 or len(lines) < 10:
+            lines.insert(i, f'inserted line {rng.random()}\n')
+        else:
+            del lines[i]
+
+
+def build_history(lines, edits, seed):
+    rng = random.Random(seed)
+    user = User(username=f'bench-{seed}', password_hash='x', api_key=f'bench-key-{seed}')
+    db.session.add(user)
+    db.session.commit()
+    paste = Paste(title='bench paste', user_id=user.id)
+    paste.set_content(''.join(lines))
+    db.session.add(paste)
+    db.session.commit()
+
+    full_copies = len(paste.content.encode('utf-8'))
+    start = time.perf_counter()
+    for _ in range(edits):
+        previous = (paste.title, paste.content)
+        edit(lines, rng)
+        paste.set_content(''.join(lines))
+        revisions.record_revision(paste, user.id, previous)
+        db.session.commit()
+        full_copies += paste.content_size
+    elapsed = time.perf_counter() - start
+    return paste.paste_id, full_copies, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--lines', type=int, default=2000, help='lines in the original paste')
+    parser.add_argument('--edits', type=int, default=500)
+    parser.add_argument('--snapshot-interval', type=int, default=config.REVISION_SNAPSHOT_INTERVAL)
+    parser.add_argument('--samples', type=int, default=200, help='revisions rebuilt for the latency figures')
+    args = parser.parse_args()
+    config.REVISION_SNAPSHOT_INTERVAL = args.snapshot_interval
+    app = create_app()
+
+    with app.app_context():
+        db.create_all()
+        lines = [f'original line {i} ' + 'x' * 40 + '\n' for i in range(args.lines)]
+        paste_id, full_copies, elapsed = build_history(lines, args.edits, seed=os.getpid())
+
+        stored = db.session.execute(
+            select(func.sum(func.length(PasteRevision.data))).where(PasteRevision.paste_id == paste_id)
+        ).scalar()
+        snapshots = PasteRevision.query.filter_by(paste_id=paste_id, is_snapshot=True).count()
+        count = args.edits + 1
+        print(f'database: {db.engine.dialect.name}, {args.lines} lines, {count} revisions, '
+              f'snapshot every {args.snapshot_interval}')
+        print(f'      saving: {elapsed / args.edits * 1000:8.2f} ms per edit')
+        print(f'     storage: {stored:,} bytes in {snapshots} snapshots + deltas, '
+              f'{full_copies:,} bytes as full copies ({stored / full_copies:.1%})')
+
+        rng = random.Random(0)
+        timings = []
+        for number in (rng.randint(1, count) for _ in range(args.samples)):
+            db.session.expunge_all()
+            start = time.perf_counter()
+            revisions.get_revision(paste_id, number)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        print(f'reconstruct: median {statistics.median(timings) * 1000:.2f} ms, '
+              f'p95 {timings[int(len(timings) * 0.95) - 1] * 1000:.2f} ms, '
+              f'max {timings[-1] * 1000:.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark startup time: from a cold interpreter importing snipserve to the
+first response served, and from a fork of a preloaded master (what gunicorn
+workers do with preload_app) to the first response.
+
+    python benchmarks/bench_startup.py --runs 10
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+COLD_START = """
+import time
+start = time.perf_counter()
+from snipserve import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+response = app.test_client().get('/api/test')
+assert response.status_code == 200
+done = time.perf_counter()
+print(imported - start, created - imported, done - start)
+"""
+
+PRELOADED_FORK = """
+import os, time
+from snipserve import create_app
+app = create_app()
+read_fd, write_fd = os.pipe()
+start = time.perf_counter()
+pid = os.fork()
+if pid == 0:
+    response = app.test_client().get('/api/test')
+    assert response.status_code == 200
+    os.write(write_fd, str(time.perf_counter() - start).encode())
+    os._exit(0)
+os.waitpid(pid, 0)
+print(os.read(read_fd, 64).decode())
+"""
+
+
+def run(code):
+    env = dict(os.environ, JOB_WORKER_INPROCESS='false')
+    env.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+    output = subprocess.run(
+        [sys.executable, '-c', code], cwd=BACKEND_DIR, env=env,
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return [float(value) for value in output.split()]
+
+
+def report(label, samples):
+    ms = [sample * 1000 for sample in samples]
+    print(f'{label:>32}: median {statistics.median(ms):8.1f} ms  min {min(ms):8.1f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    cold = [run(COLD_START) for _ in range(args.runs)]
+    report('import snipserve', [sample[0] for sample in cold])
+    report('create_app()', [sample[1] for sample in cold])
+    report('cold import to first response', [sample[2] for sample in cold])
+
+    if hasattr(os, 'fork'):
+        forked = [run(PRELOADED_FORK)[0] for _ in range(args.runs)]
+        report('preloaded fork to first response', forked)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,19 @@
+import os
+
+wsgi_app = 'snipserve.wsgi:app'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5001')
+workers = int(os.environ.get('GUNICORN_WORKERS', 4))
+
+# Build the app once in the master; forked workers share the imported, warmed state
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+
+def post_fork(server, worker):
+    """Connection pools must not be shared across processes, drop the ones inherited from the master"""
+    from snipserve import db, replicas
+    from snipserve.wsgi import app
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    replicas.dispose_engines(close=False)
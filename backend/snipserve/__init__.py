@@ -4,29 +4,60 @@ from flask_cors import CORS
 from snipserve import config
 from flask_login import LoginManager
 from flask_bcrypt import Bcrypt
-from flask_migrate import Migrate
-
-
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = config.SQLALCHEMY_DATABASE_URI
-app.config['SECRET_KEY'] = config.SECRET_KEY
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# Enable CORS for frontend communication
-CORS(app, supports_credentials=True, origins=[
-    'http://localhost:5001', 
-    'http://localhost:4174', 
-    'http://localhost:5173',
-    'https://snipserve.spkal01.me'
-])
-
-db = SQLAlchemy(app)
-login_manager = LoginManager(app)
-login_manager.init_app(app)
-bcrypt = Bcrypt(app)
-migrate = Migrate(app, db)
-
-# Import routes after creating app and db to avoid circular imports
-from snipserve import routes
-# Import models after creating app and db to ensure they are registered
-from snipserve import models
\ No newline at end of file
+from snipserve.json_provider import get_json_provider_class
+from snipserve import replicas
+
+
+# Extensions are created unbound and attached to an app by create_app()
+# Routing session: SELECTs of read-only routes may go to a read replica
+db = SQLAlchemy(session_options={'class_': replicas.RoutingSession})
+login_manager = LoginManager()
+bcrypt = Bcrypt()
+cors = CORS()
+
+
+def create_app(overrides=None):
+    """Application factory, used by the flask CLI, the WSGI entry point and tests"""
+    app = Flask(__name__)
+    app.json_provider_class = get_json_provider_class(config.JSON_PROVIDER)
+    app.json = app.json_provider_class(app)
+    app.config['SQLALCHEMY_DATABASE_URI'] = config.SQLALCHEMY_DATABASE_URI
+    app.config['SECRET_KEY'] = config.SECRET_KEY
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Bodies above this are rejected with 413 before they are read
+    app.config['MAX_CONTENT_LENGTH'] = config.MAX_CONTENT_LENGTH
+    if overrides:
+        app.config.update(overrides)
+
+    # Enable CORS for frontend communication
+    cors.init_app(app, supports_credentials=True, origins=[
+        'http://localhost:5001', 
+        'http://localhost:4174', 
+        'http://localhost:5173',
+        'https://snipserve.spkal01.me'
+    ])
+
+    db.init_app(app)
+    login_manager.init_app(app)
+    bcrypt.init_app(app)
+    _init_migrations(app)
+
+    # Imported here: these modules need the extensions above, but no app
+    from snipserve import models, routes, commands, compression, jobs, tasks
+    app.register_blueprint(routes.bp)
+    app.register_blueprint(commands.bp)
+    replicas.init_app(app)
+    # Negotiated gzip/brotli/zstd compression for large responses
+    compression.init_app(app)
+    # Background jobs: in-process worker, started on the first request
+    jobs.init_app(app)
+    return app
+
+
+def _init_migrations(app):
+    """Flask-Migrate pulls in alembic, which only the `flask db` commands need"""
+    import click
+    if click.get_current_context(silent=True) is None:
+        return
+    from flask_migrate import Migrate
+    Migrate(app, db)
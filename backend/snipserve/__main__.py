@@ -1,5 +1,4 @@
-from snipserve import app, db
-from snipserve.models import Paste  # Explicitly import models to ensure they're registered
+from snipserve import create_app
 
 if __name__ == '__main__':
-    app.run()
\ No newline at end of file
+    create_app().run()
@@ -1,7 +1,90 @@
 from functools import wraps
 from flask import request, jsonify, g
+from flask_login import UserMixin
+from snipserve import db, config
+from snipserve.cache import make_cache
 from snipserve.models import User
 
+# ('id', user_id) -> identity snapshot, ('api_key', key) -> user_id
+user_cache = make_cache('users', maxsize=config.USER_CACHE_SIZE, ttl=config.USER_CACHE_TTL, item_size=512)
+
+
+class CachedUser(UserMixin):
+    """Read-only identity of an authenticated user, served from the user cache.
+
+    Routes that modify the user must load the User model themselves.
+    """
+
+    def __init__(self, snapshot):
+        self.id = snapshot['id']
+        self.username = snapshot['username']
+        self.api_key = snapshot['api_key']
+        self.is_admin = snapshot['is_admin']
+        self.created_at = snapshot['created_at']
+
+    def __repr__(self):
+        return f'<CachedUser {self.username}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'username': self.username,
+            'created_at': self.created_at,
+            'is_admin': self.is_admin,
+        }
+
+
+def _snapshot(user):
+    return {
+        'id': user.id,
+        'username': user.username,
+        'api_key': user.api_key,
+        'is_admin': user.is_admin,
+        'created_at': user.created_at.isoformat(),
+    }
+
+
+def load_user_identity(user_id):
+    """Return the CachedUser for an ID, hitting the database only on a cache miss"""
+    snapshot = user_cache.get(('id', user_id))
+    if snapshot is None:
+        user = db.session.get(User, user_id)
+        if user is None or user.is_disabled:
+            return None
+        snapshot = _snapshot(user)
+        user_cache.set(('id', user_id), snapshot)
+        user_cache.set(('api_key', user.api_key), user_id)
+    return CachedUser(snapshot)
+
+
+def load_user_by_api_key(api_key):
+    """Return the CachedUser owning an API key, or None"""
+    user_id = user_cache.get(('api_key', api_key))
+    if user_id is None:
+        user = User.query.filter_by(api_key=api_key).first()
+        if user is None or user.is_disabled:
+            return None
+        snapshot = _snapshot(user)
+        user_cache.set(('id', user.id), snapshot)
+        user_cache.set(('api_key', api_key), user.id)
+        return CachedUser(snapshot)
+    identity = load_user_identity(user_id)
+    # The key may have been rotated since it was cached
+    if identity is None or identity.api_key != api_key:
+        user_cache.delete(('api_key', api_key))
+        return None
+    return identity
+
+
+def invalidate_user(user_id, *api_keys):
+    """Drop a user (and any of their old API keys) from this process' cache"""
+    snapshot = user_cache.get(('id', user_id))
+    user_cache.delete(('id', user_id))
+    if snapshot:
+        user_cache.delete(('api_key', snapshot['api_key']))
+    for api_key in api_keys:
+        user_cache.delete(('api_key', api_key))
+
 def api_key_required(f):
     """Decorator to require API key authentication"""
     @wraps(f)
@@ -19,7 +102,7 @@ def api_key_required(f):
             return jsonify({'error': 'API key required'}), 401
         
         # Validate API key
-        user = User.query.filter_by(api_key=api_key).first()
+        user = load_user_by_api_key(api_key)
         if not user:
             return jsonify({'error': 'Invalid API key'}), 401
         
@@ -47,7 +130,7 @@ def auth_required(f):
             api_key = request.args.get('api_key')
         
         if api_key:
-            user = User.query.filter_by(api_key=api_key).first()
+            user = load_user_by_api_key(api_key)
             if user:
                 g.current_user = user
                 return f(*args, **kwargs)
@@ -75,7 +158,7 @@ def optional_auth(f):
             api_key = request.args.get('api_key')
         
         if api_key:
-            user = User.query.filter_by(api_key=api_key).first()
+            user = load_user_by_api_key(api_key)
             if user:
                 g.current_user = user
         
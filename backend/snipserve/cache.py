@@ -0,0 +1,321 @@
+import hashlib
+import marshal
+import os
+import stat
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from snipserve import config
+
+
+class LRUCache:
+    """Small thread-safe LRU cache with optional per-entry TTL"""
+
+    def __init__(self, maxsize=1024, ttl=None, max_bytes=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # When set, values must support len() and the cache is bounded by total size
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                self._pop(key)
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        size = len(value) if self.max_bytes else 0
+        if self.max_bytes and size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            self._data[key] = (value, expires_at)
+            self._bytes += size
+            while len(self._data) > self.maxsize or (self.max_bytes and self._bytes > self.max_bytes):
+                self._pop(next(iter(self._data)))
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def _pop(self, key):
+        value, _ = self._data.pop(key)
+        if self.max_bytes:
+            self._bytes -= len(value)
+        return value
+
+
+try:
+    import fcntl
+    import mmap
+except ImportError:  # not available on Windows, make_cache() falls back to LRUCache
+    fcntl = None
+
+
+class MmapCache:
+    """LRUCache-compatible cache stored in a memory-mapped file shared by all processes on the host.
+
+    The file is a set-associative hash table: a key hashes to one bucket of
+    `ways` fixed-size slots, and a full bucket evicts its least recently
+    used slot. Each bucket is guarded by its own fcntl byte-range lock (plus
+    a thread lock, since fcntl locks are per process), so workers only
+    contend when they touch the same bucket. Keys and values are encoded
+    with marshal, which can't run code on load, so only plain data (dicts,
+    lists, tuples, str, bytes, numbers) can be cached; values that don't fit
+    in a slot are simply not cached. The cache directory must belong to the
+    server user and is kept private to it.
+    """
+
+    MAGIC = b'SNIPCACH'
+    HEADER = struct.Struct('<8sIIII')  # magic, version, buckets, ways, slot size
+    SLOT_HEADER = struct.Struct('<QddII')  # key hash (0 = empty), expires at, last access, key length, value length
+    VERSION = 2
+    # No back-references from version 3 on, so equal keys always encode to the same bytes
+    MARSHAL_VERSION = 2
+    THREAD_LOCK_STRIPES = 64
+
+    def __init__(self, path, maxsize=1024, ttl=None, slot_size=4096, ways=8):
+        self.path = path
+        self.ttl = ttl
+        self.ways = ways
+        self.buckets = max(1, -(-maxsize // ways))
+        self.slot_size = max(slot_size, self.SLOT_HEADER.size + 64)
+        self.bucket_size = self.ways * self.slot_size
+        self.size = self.HEADER.size + self.buckets * self.bucket_size
+        self._thread_locks = [threading.Lock() for _ in range(self.THREAD_LOCK_STRIPES)]
+        self._open_lock = threading.Lock()
+        self._map = None
+        self._fd = None
+
+    def _open(self):
+        """Map the file, replacing it if it was created with other parameters"""
+        with self._open_lock:
+            if self._map is not None:
+                return
+            _private_dir(os.path.dirname(self.path))
+            expected = self.HEADER.pack(self.MAGIC, self.VERSION, self.buckets, self.ways, self.slot_size)
+            while True:
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+                try:
+                    fcntl.lockf(fd, fcntl.LOCK_EX, self.HEADER.size, 0)
+                    st = os.fstat(fd)
+                    if st.st_uid != os.getuid():
+                        raise PermissionError(f'{self.path} is not owned by the server user')
+                    current = os.stat(self.path, follow_symlinks=False)
+                    if (st.st_dev, st.st_ino) == (current.st_dev, current.st_ino):
+                        if st.st_size == self.size and os.pread(fd, self.HEADER.size, 0) == expected:
+                            break
+                        # Never resize a file other processes may have mapped (they'd get SIGBUS):
+                        # build the new one aside and swap it in, then open that
+                        self._replace_file(expected)
+                    fcntl.lockf(fd, fcntl.LOCK_UN, self.HEADER.size, 0)
+                except BaseException:
+                    os.close(fd)
+                    raise
+                os.close(fd)
+            try:
+                self._map = mmap.mmap(fd, self.size, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+            finally:
+                fcntl.lockf(fd, fcntl.LOCK_UN, self.HEADER.size, 0)
+            self._fd = fd
+
+    def _replace_file(self, header):
+        directory, name = os.path.split(self.path)
+        fd, temp_path = tempfile.mkstemp(prefix=f'.{name}.', dir=directory)
+        try:
+            os.ftruncate(fd, self.size)  # sparse, zeroed: every slot empty
+            os.pwrite(fd, header, 0)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        finally:
+            os.close(fd)
+
+    def _locate(self, key):
+        key_bytes = marshal.dumps(key, self.MARSHAL_VERSION)
+        key_hash = int.from_bytes(hashlib.blake2b(key_bytes, digest_size=8).digest(), 'little') | 1
+        return key_bytes, key_hash, key_hash % self.buckets
+
+    def _locked(self, bucket):
+        return _BucketLock(self, bucket)
+
+    def _slots(self, bucket):
+        start = self.HEADER.size + bucket * self.bucket_size
+        return range(start, start + self.bucket_size, self.slot_size)
+
+    def _find(self, offset_range, key_hash, key_bytes):
+        for offset in offset_range:
+            slot_hash, _, _, key_len, _ = self.SLOT_HEADER.unpack_from(self._map, offset)
+            if slot_hash == key_hash:
+                key_start = offset + self.SLOT_HEADER.size
+                if self._map[key_start:key_start + key_len] == key_bytes:
+                    return offset
+        return None
+
+    def get(self, key, default=None):
+        if self._map is None:
+            self._open()
+        key_bytes, key_hash, bucket = self._locate(key)
+        now = time.time()
+        with self._locked(bucket):
+            offset = self._find(self._slots(bucket), key_hash, key_bytes)
+            if offset is None:
+                return default
+            _, expires_at, _, key_len, value_len = self.SLOT_HEADER.unpack_from(self._map, offset)
+            if expires_at and expires_at < now:
+                self._map[offset:offset + 8] = bytes(8)
+                return default
+            self.SLOT_HEADER.pack_into(self._map, offset, key_hash, expires_at, now, key_len, value_len)
+            value_start = offset + self.SLOT_HEADER.size + key_len
+            value = self._map[value_start:value_start + value_len]
+        return marshal.loads(value)
+
+    def set(self, key, value, ttl=None):
+        if self._map is None:
+            self._open()
+        key_bytes, key_hash, bucket = self._locate(key)
+        value_bytes = marshal.dumps(value, self.MARSHAL_VERSION)
+        if self.SLOT_HEADER.size + len(key_bytes) + len(value_bytes) > self.slot_size:
+            self.delete(key)
+            return
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        with self._locked(bucket):
+            slots = self._slots(bucket)
+            offset = self._find(slots, key_hash, key_bytes)
+            if offset is None:
+                offset = self._victim(slots, now)
+            self._map[offset + self.SLOT_HEADER.size:offset + self.SLOT_HEADER.size + len(key_bytes) + len(value_bytes)] = key_bytes + value_bytes
+            self.SLOT_HEADER.pack_into(
+                self._map, offset, key_hash, now + ttl if ttl else 0.0, now, len(key_bytes), len(value_bytes)
+            )
+
+    def _victim(self, slots, now):
+        """An empty or expired slot if there is one, else the least recently used"""
+        victim, oldest = None, None
+        for offset in slots:
+            slot_hash, expires_at, last_access, _, _ = self.SLOT_HEADER.unpack_from(self._map, offset)
+            if slot_hash == 0 or (expires_at and expires_at < now):
+                return offset
+            if oldest is None or last_access < oldest:
+                victim, oldest = offset, last_access
+        return victim
+
+    def delete(self, key):
+        if self._map is None:
+            self._open()
+        key_bytes, key_hash, bucket = self._locate(key)
+        with self._locked(bucket):
+            offset = self._find(self._slots(bucket), key_hash, key_bytes)
+            if offset is not None:
+                self._map[offset:offset + 8] = bytes(8)
+
+    def clear(self):
+        if self._map is None:
+            self._open()
+        table_size = self.size - self.HEADER.size
+        for lock in self._thread_locks:
+            lock.acquire()
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, table_size, self.HEADER.size)
+        try:
+            for offset in range(self.HEADER.size, self.size, self.slot_size):
+                # Only touch used slots, so never used pages of the sparse file stay unallocated
+                if self._map[offset:offset + 8] != bytes(8):
+                    self._map[offset:offset + 8] = bytes(8)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, table_size, self.HEADER.size)
+            for lock in self._thread_locks:
+                lock.release()
+
+    def __len__(self):
+        if self._map is None:
+            self._open()
+        now = time.time()
+        count = 0
+        for bucket in range(self.buckets):
+            for offset in self._slots(bucket):
+                slot_hash, expires_at, _, _, _ = self.SLOT_HEADER.unpack_from(self._map, offset)
+                if slot_hash and not (expires_at and expires_at < now):
+                    count += 1
+        return count
+
+
+def _private_dir(path):
+    """Create the cache directory (mode 0700), refusing one the server user doesn't own"""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.stat(path, follow_symlinks=False)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid():
+        raise PermissionError(f'Cache directory {path} is not a directory owned by the server user')
+    if stat.S_IMODE(st.st_mode) != 0o700:
+        os.chmod(path, 0o700)
+
+
+class _BucketLock:
+    """Thread lock stripe + fcntl lock on the bucket's byte range"""
+
+    def __init__(self, cache, bucket):
+        self.cache = cache
+        self.start = cache.HEADER.size + bucket * cache.bucket_size
+        self.thread_lock = cache._thread_locks[bucket % cache.THREAD_LOCK_STRIPES]
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        try:
+            fcntl.lockf(self.cache._fd, fcntl.LOCK_EX, self.cache.bucket_size, self.start)
+        except BaseException:
+            self.thread_lock.release()
+            raise
+
+    def __exit__(self, *exc_info):
+        try:
+            fcntl.lockf(self.cache._fd, fcntl.LOCK_UN, self.cache.bucket_size, self.start)
+        finally:
+            self.thread_lock.release()
+
+
+# Every cache created through make_cache(), by name
+caches = {}
+
+
+def make_cache(name, maxsize=1024, ttl=None, max_bytes=None, item_size=None):
+    """Create a named cache on the configured backend (config.CACHE_BACKEND).
+
+    `item_size` is the largest entry the mmap backend stores (its slot size);
+    for byte-bounded caches it defaults to max_bytes / maxsize.
+    """
+    if config.CACHE_BACKEND == 'mmap' and fcntl is not None:
+        slot_size = item_size or (max_bytes // maxsize if max_bytes else config.CACHE_SLOT_SIZE)
+        cache = MmapCache(os.path.join(config.CACHE_DIR, f'{name}.cache'), maxsize=maxsize, ttl=ttl, slot_size=slot_size)
+    else:
+        cache = LRUCache(maxsize=maxsize, ttl=ttl, max_bytes=max_bytes)
+    caches[name] = cache
+    return cache
+
+
+def clear_caches():
+    for cache in caches.values():
+        cache.clear()
@@ -0,0 +1,109 @@
+import time
+import click
+from flask import Blueprint
+from snipserve import db, bcrypt, config, counters, jobs, pastes, transfer
+from snipserve.models import User
+from snipserve.routes import generate_api_key
+
+# CLI only blueprint; cli_group=None registers the commands at the top level (`flask init-db`)
+bp = Blueprint('commands', __name__, cli_group=None)
+
+
+@bp.cli.command('init-db')
+def init_db_command():
+    """Create the database schema and the default admin user (run once per deployment)"""
+    db.create_all()
+    click.echo('Database schema created.')
+    create_default_admin()
+
+
+def create_default_admin():
+    """Create a default admin user if it doesn't exist"""
+    admin_username = config.ADMIN_USERNAME
+    admin_password = config.ADMIN_PASSWORD
+    
+    if User.query.filter_by(username=admin_username).first() is None:
+        hashed_password = bcrypt.generate_password_hash(admin_password).decode('utf-8')
+        api_key = generate_api_key()
+        admin_user = User(
+            username=admin_username, 
+            password_hash=hashed_password, 
+            api_key=api_key, 
+            is_admin=True
+        )
+        db.session.add(admin_user)
+        db.session.commit()
+        click.echo(f"Default admin user '{admin_username}' created.")
+    else:
+        click.echo(f"Admin user '{admin_username}' already exists.")
+
+
+@bp.cli.command('fold-view-counts')
+def fold_view_counts_command():
+    """Fold sharded view counters back into Paste.view_count"""
+    folded = counters.fold_view_shards()
+    click.echo(f'Folded view counters of {folded} paste(s).')
+
+
+@bp.cli.command('purge-expired')
+@click.option('--batch-size', type=int, default=None, help='Pastes deleted per transaction (default JOB_BATCH_SIZE).')
+def purge_expired_command(batch_size):
+    """Delete pastes past their expiry, with their views"""
+    purged = pastes.purge_expired(batch_size)
+    click.echo(f'Purged {purged} expired paste(s).')
+
+
+@bp.cli.command('backfill-content-digests')
+@click.option('--batch-size', type=int, default=None, help='Pastes updated per transaction (default JOB_BATCH_SIZE).')
+def backfill_content_digests_command(batch_size):
+    """Compute the hash and size of pastes stored before they were recorded (run once after upgrading)"""
+    filled = pastes.backfill_content_digests(batch_size)
+    click.echo(f'Backfilled hash and size of {filled} paste(s).')
+
+
+@bp.cli.command('export-pastes')
+@click.argument('output', type=click.File('w', encoding='utf-8'), default='-')
+@click.option('--user', 'username', help='Only export the pastes of this user.')
+def export_pastes_command(output, username):
+    """Write pastes as NDJSON to OUTPUT (default stdout)"""
+    user_id = None
+    if username:
+        user = User.query.filter_by(username=username).first()
+        if user is None:
+            raise click.ClickException(f'User {username!r} not found')
+        user_id = user.id
+    for line in transfer.export_pastes(user_id):
+        output.write(line)
+
+
+@bp.cli.command('import-pastes')
+@click.argument('source', type=click.File('r', encoding='utf-8'), default='-')
+@click.option('--user', 'username', help='Give every paste to this user instead of matching usernames.')
+def import_pastes_command(source, username):
+    """Create pastes from an NDJSON export in SOURCE (default stdin)"""
+    owner_id = None
+    if username:
+        user = User.query.filter_by(username=username).first()
+        if user is None:
+            raise click.ClickException(f'User {username!r} not found')
+        owner_id = user.id
+    summary = transfer.import_pastes(source, owner_id)
+    click.echo(f"Imported {summary['imported']} paste(s), {len(summary['renamed'])} with a new ID, "
+               f"skipped {summary['skipped']}.")
+    for error in summary['errors']:
+        click.echo(f"line {error['line']}: {error['error']}", err=True)
+
+
+@bp.cli.command('run-jobs')
+@click.option('--once', is_flag=True, help='Drain the queue and exit instead of polling forever.')
+def run_jobs_command(once):
+    """Run queued background jobs"""
+    if once:
+        click.echo(f'Ran {jobs.run_pending()} job(s).')
+        return
+    click.echo('Job worker started, press Ctrl+C to stop.')
+    while True:
+        jobs.schedule_periodic()
+        jobs.run_pending()
+        db.session.remove()
+        time.sleep(config.JOB_POLL_INTERVAL)
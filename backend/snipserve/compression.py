@@ -0,0 +1,122 @@
+import gzip
+import hashlib
+from flask import request, g
+from snipserve import config
+from snipserve.cache import make_cache
+
+try:
+    import brotli
+except ImportError:  # brotli is optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional
+    zstandard = None
+
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+}
+
+
+def _gzip(data):
+    return gzip.compress(data, compresslevel=config.COMPRESS_GZIP_LEVEL)
+
+
+def _brotli(data):
+    return brotli.compress(data, quality=config.COMPRESS_BROTLI_QUALITY)
+
+
+def _zstd(data):
+    return zstandard.ZstdCompressor(level=config.COMPRESS_ZSTD_LEVEL).compress(data)
+
+
+# Ordered by server preference, used to break ties between equal client q-values
+ENCODERS = {}
+if zstandard is not None:
+    ENCODERS['zstd'] = _zstd
+if brotli is not None:
+    ENCODERS['br'] = _brotli
+ENCODERS['gzip'] = _gzip
+
+# Compressed bodies of hot payloads, keyed by (encoding, digest of the uncompressed body)
+precompressed_cache = make_cache(
+    'compressed',
+    maxsize=config.COMPRESS_CACHE_ENTRIES,
+    max_bytes=config.COMPRESS_CACHE_BYTES,
+)
+
+
+def choose_encoding(accept_encodings):
+    """Pick the best supported encoding for an Accept-Encoding header, or None"""
+    explicit = {}
+    wildcard = 0
+    for value, quality in accept_encodings:
+        if value == '*':
+            wildcard = quality
+        else:
+            explicit[value.lower()] = quality
+
+    best, best_quality = None, 0
+    for encoding in ENCODERS:
+        quality = explicit.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def is_compressible(response):
+    mimetype = response.mimetype or ''
+    return mimetype.startswith('text/') or mimetype in COMPRESSIBLE_MIMETYPES
+
+
+def compress(data, encoding, cache=False):
+    """Compress data, optionally going through the precompressed cache"""
+    if not cache:
+        return ENCODERS[encoding](data)
+    key = (encoding, hashlib.blake2b(data, digest_size=16).digest())
+    compressed = precompressed_cache.get(key)
+    if compressed is None:
+        compressed = ENCODERS[encoding](data)
+        precompressed_cache.set(key, compressed)
+    return compressed
+
+
+def compress_response(response):
+    """after_request hook negotiating gzip/brotli/zstd for large text responses"""
+    if not config.COMPRESS_ENABLED or not is_compressible(response):
+        return response
+    response.vary.add('Accept-Encoding')
+
+    if (
+        response.status_code < 200
+        or response.status_code in (204, 206, 304)
+        or response.direct_passthrough
+        or response.is_streamed
+        or 'Content-Encoding' in response.headers
+    ):
+        return response
+
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    data = response.get_data()
+    if len(data) < config.COMPRESS_MIN_SIZE:
+        return response
+
+    compressed = compress(data, encoding, cache=g.get('cache_compressed', False))
+    if len(compressed) >= len(data):
+        return response
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_app(app):
+    app.after_request(compress_response)
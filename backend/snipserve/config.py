@@ -1,5 +1,6 @@
 from dotenv import load_dotenv
 import os
+import tempfile
 # Load environment variables from .env file
 load_dotenv()
 
@@ -9,4 +10,91 @@ SQLALCHEMY_DATABASE_URI = DATABASE_URL
 SECRET_KEY = os.environ.get('SECRET_KEY', 'your-secret-key-here')
 INVITE_CODE = os.environ.get('INVITE_CODE', 'test')
 ADMIN_USERNAME = os.environ.get('ADMIN_USERNAME', 'admin')
-ADMIN_PASSWORD = os.environ.get('ADMIN_PASSWORD', 'admin123')
\ No newline at end of file
+ADMIN_PASSWORD = os.environ.get('ADMIN_PASSWORD', 'admin123')
+
+# JSON serialization: 'orjson' (falls back to 'stdlib' when not installed), 'stdlib' or 'module:Class'
+JSON_PROVIDER = os.environ.get('JSON_PROVIDER', 'orjson')
+
+# Response compression
+COMPRESS_ENABLED = os.environ.get('COMPRESS_ENABLED', 'true').lower() == 'true'
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+COMPRESS_GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', 6))
+COMPRESS_BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 5))
+COMPRESS_ZSTD_LEVEL = int(os.environ.get('COMPRESS_ZSTD_LEVEL', 3))
+COMPRESS_CACHE_ENTRIES = int(os.environ.get('COMPRESS_CACHE_ENTRIES', 256))
+COMPRESS_CACHE_BYTES = int(os.environ.get('COMPRESS_CACHE_BYTES', 32 * 1024 * 1024))
+
+# Sharded view counters for hot pastes
+SHARDED_COUNTERS_ENABLED = os.environ.get('SHARDED_COUNTERS_ENABLED', 'true').lower() == 'true'
+VIEW_COUNTER_SHARDS = int(os.environ.get('VIEW_COUNTER_SHARDS', 16))
+# Views per minute (per worker) after which a paste switches to sharded counting
+HOT_PASTE_VIEWS_PER_MINUTE = int(os.environ.get('HOT_PASTE_VIEWS_PER_MINUTE', 120))
+
+# Background jobs
+# Run a job worker thread inside each web process; disable when running `flask run-jobs` separately
+JOB_WORKER_INPROCESS = os.environ.get('JOB_WORKER_INPROCESS', 'true').lower() == 'true'
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 1.0))
+JOB_RETRY_DELAY = int(os.environ.get('JOB_RETRY_DELAY', 10))  # seconds, doubled on each retry
+JOB_TIMEOUT = int(os.environ.get('JOB_TIMEOUT', 600))  # running jobs older than this are retried
+JOB_BATCH_SIZE = int(os.environ.get('JOB_BATCH_SIZE', 500))  # rows per transaction in bulk jobs
+VIEW_COUNTER_FOLD_INTERVAL = int(os.environ.get('VIEW_COUNTER_FOLD_INTERVAL', 60))
+# Trending feed: views lose half their weight every TRENDING_HALF_LIFE seconds
+TRENDING_HALF_LIFE = int(os.environ.get('TRENDING_HALF_LIFE', 6 * 3600))
+TRENDING_SIZE = int(os.environ.get('TRENDING_SIZE', 50))  # pastes kept in each process' top list
+TRENDING_FLUSH_INTERVAL = int(os.environ.get('TRENDING_FLUSH_INTERVAL', 30))  # seconds between score writes
+TRENDING_REFRESH_INTERVAL = int(os.environ.get('TRENDING_REFRESH_INTERVAL', 30))  # seconds between top list reloads
+# Expired pastes are hidden immediately and deleted by a sweep this often
+EXPIRED_PASTE_SWEEP_INTERVAL = int(os.environ.get('EXPIRED_PASTE_SWEEP_INTERVAL', 300))
+
+# Admin dashboard stats are recomputed in the background every this many seconds
+STATS_REFRESH_INTERVAL = int(os.environ.get('STATS_REFRESH_INTERVAL', 60))
+
+# Per-process cache of authenticated user identities (session and API key lookups)
+USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 30))
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 10000))
+
+# Read replicas: comma separated database URLs used by read-only routes
+REPLICA_DATABASE_URLS = [url.strip() for url in os.environ.get('REPLICA_DATABASE_URLS', '').split(',') if url.strip()]
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', 5))
+REPLICA_CHECK_INTERVAL = float(os.environ.get('REPLICA_CHECK_INTERVAL', 5))
+# Reads by a writer (and of a written paste) stay on the primary for this long after a write
+READ_YOUR_WRITES_SECONDS = int(os.environ.get('READ_YOUR_WRITES_SECONDS', 10))
+
+# Cache backend for paste payloads, auth lookups and view dedup state:
+# 'memory' (per process) or 'mmap' (one copy shared by all workers on the host)
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')
+CACHE_DIR = os.environ.get('CACHE_DIR', os.path.join(tempfile.gettempdir(), 'snipserve-cache'))
+# Largest cached value (key included) for caches that aren't bounded by bytes
+CACHE_SLOT_SIZE = int(os.environ.get('CACHE_SLOT_SIZE', 4096))
+
+# Content of recently viewed pastes, by hash (content larger than PASTE_CACHE_ITEM_SIZE isn't cached)
+PASTE_CACHE_SIZE = int(os.environ.get('PASTE_CACHE_SIZE', 1024))
+PASTE_CACHE_TTL = int(os.environ.get('PASTE_CACHE_TTL', 10))
+PASTE_CACHE_ITEM_SIZE = int(os.environ.get('PASTE_CACHE_ITEM_SIZE', 64 * 1024))
+# Viewers already counted, so repeat views skip the dedup query
+VIEW_DEDUP_CACHE_SIZE = int(os.environ.get('VIEW_DEDUP_CACHE_SIZE', 100000))
+
+# Uploads: largest accepted request body and paste content, in bytes
+MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 64 * 1024 * 1024))
+MAX_PASTE_SIZE = int(os.environ.get('MAX_PASTE_SIZE', 50 * 1024 * 1024))
+# Raw and multipart paste bodies are read in chunks of this size; bodies up to
+# UPLOAD_SPOOL_SIZE are spooled in memory, larger ones to a temporary file
+UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 64 * 1024))
+UPLOAD_SPOOL_SIZE = int(os.environ.get('UPLOAD_SPOOL_SIZE', 1024 * 1024))
+
+# Paste revisions are stored as line deltas, with a full snapshot every this many revisions
+REVISION_SNAPSHOT_INTERVAL = int(os.environ.get('REVISION_SNAPSHOT_INTERVAL', 20))
+
+# NDJSON export/import: rows fetched per cursor round trip, pastes inserted per transaction
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 500))
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 500))
+# Largest accepted import body, in bytes (imports are streamed, unlike other requests)
+MAX_IMPORT_SIZE = int(os.environ.get('MAX_IMPORT_SIZE', 1024 * 1024 * 1024))
+# Longest NDJSON line read into memory; JSON escaping can make a record about twice its content size
+MAX_IMPORT_LINE_SIZE = int(os.environ.get('MAX_IMPORT_LINE_SIZE', 2 * MAX_PASTE_SIZE + 64 * 1024))
+
+# Server-side syntax highlighting (needs Pygments), rendered by a background job per content hash
+HIGHLIGHT_ENABLED = os.environ.get('HIGHLIGHT_ENABLED', 'true').lower() == 'true'
+HIGHLIGHT_STYLE = os.environ.get('HIGHLIGHT_STYLE', 'default')
+HIGHLIGHT_MAX_SIZE = int(os.environ.get('HIGHLIGHT_MAX_SIZE', 2 * 1024 * 1024))  # larger pastes stay plain text
+HIGHLIGHT_DETECT_SAMPLE = int(os.environ.get('HIGHLIGHT_DETECT_SAMPLE', 16 * 1024))  # chars used to guess the language
@@ -0,0 +1,208 @@
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import and_, delete, exists, insert, literal, select, update
+from snipserve import db, config
+from snipserve.cache import make_cache
+from snipserve.models import Paste, PasteView, PasteViewShard
+
+# Only count one view per IP/user per paste in this window
+VIEW_DEDUP_WINDOW = timedelta(hours=24)
+
+# (paste_id, user_id or IP) of views counted within the dedup window
+seen_viewers = make_cache(
+    'seen_viewers',
+    maxsize=config.VIEW_DEDUP_CACHE_SIZE,
+    ttl=VIEW_DEDUP_WINDOW.total_seconds(),
+    item_size=128,
+)
+
+# Per-process view rate tracking: paste_id -> [window start, views in window]
+_rates = {}
+_hot_pastes = set()
+_rates_lock = threading.Lock()
+
+
+def record_view(paste_id, ip_address, user_id=None):
+    """Record a view and bump the paste's counter atomically.
+
+    The dedup check and the PasteView insert are a single INSERT ... SELECT
+    WHERE NOT EXISTS, and the counter is bumped in SQL, so concurrent views
+    never lose increments and no Paste row is held in the ORM session.
+    Viewers counted recently are remembered in the seen_viewers cache and
+    don't reach the database at all.
+
+    Returns the new view count, or None if the view was a duplicate.
+    """
+    viewer = (paste_id, 'user', user_id) if user_id else (paste_id, 'ip', ip_address)
+    if seen_viewers.get(viewer):
+        return None
+
+    now = datetime.utcnow()
+    if user_id:
+        # For authenticated users, check by user ID (more reliable)
+        same_viewer = PasteView.user_id == user_id
+    else:
+        # For anonymous users, check by IP address
+        same_viewer = and_(PasteView.ip_address == ip_address, PasteView.user_id.is_(None))
+
+    recent_view = select(PasteView.id).where(
+        PasteView.paste_id == paste_id,
+        PasteView.viewed_at > now - VIEW_DEDUP_WINDOW,
+        same_viewer,
+    )
+    new_view = select(
+        literal(paste_id, PasteView.paste_id.type),
+        literal(ip_address, PasteView.ip_address.type),
+        literal(user_id, PasteView.user_id.type),
+        literal(now, PasteView.viewed_at.type),
+    ).where(~exists(recent_view))
+
+    try:
+        result = db.session.execute(
+            insert(PasteView).from_select(['paste_id', 'ip_address', 'user_id', 'viewed_at'], new_view)
+        )
+        view_count = increment_view_count(paste_id) if result.rowcount > 0 else None
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    if view_count is not None:
+        seen_viewers.set(viewer, True)
+    return view_count
+
+
+def increment_view_count(paste_id):
+    """Add one view to a paste, returning the new total.
+
+    Hot pastes are incremented on a random shard row so concurrent writers
+    don't all queue on the paste row lock; everything else is a plain
+    UPDATE paste SET view_count = view_count + 1.
+    """
+    if config.SHARDED_COUNTERS_ENABLED and _is_hot(paste_id):
+        result = db.session.execute(
+            update(PasteViewShard)
+            .where(
+                PasteViewShard.paste_id == paste_id,
+                PasteViewShard.shard == random.randrange(config.VIEW_COUNTER_SHARDS),
+            )
+            .values(count=PasteViewShard.count + 1)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount > 0:
+            return get_view_count(paste_id)
+        # Shards were folded away in the meantime, count on the paste row
+        with _rates_lock:
+            _hot_pastes.discard(paste_id)
+
+    stmt = (
+        update(Paste)
+        .where(Paste.paste_id == paste_id)
+        .values(view_count=Paste.view_count + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if db.engine.dialect.update_returning:
+        column = view_count_column() if config.SHARDED_COUNTERS_ENABLED else Paste.view_count
+        return db.session.execute(stmt.returning(column)).scalar()
+    db.session.execute(stmt)
+    return get_view_count(paste_id)
+
+
+def view_count_column():
+    """Paste.view_count plus any not yet folded shard counts"""
+    return Paste.total_view_count.label('view_count')
+
+
+def get_view_count(paste_id):
+    """Current view count for a paste, or None if it doesn't exist"""
+    if not config.SHARDED_COUNTERS_ENABLED:
+        return db.session.execute(
+            select(Paste.view_count).where(Paste.paste_id == paste_id)
+        ).scalar()
+    return db.session.execute(
+        select(view_count_column()).where(Paste.paste_id == paste_id)
+    ).scalar()
+
+
+def _is_hot(paste_id):
+    """Track the view rate of a paste and switch it to sharded counting past the threshold"""
+    now = time.monotonic()
+    with _rates_lock:
+        if paste_id in _hot_pastes:
+            return True
+        if len(_rates) > 10000:
+            # Forget pastes whose rate window went stale
+            for stale in [key for key, (start, _) in _rates.items() if now - start > 60]:
+                del _rates[stale]
+        window = _rates.setdefault(paste_id, [now, 0])
+        if now - window[0] > 60:
+            window[0], window[1] = now, 0
+        window[1] += 1
+        if window[1] < config.HOT_PASTE_VIEWS_PER_MINUTE:
+            return False
+        del _rates[paste_id]
+    promote(paste_id)
+    return True
+
+
+def promote(paste_id):
+    """Create the counter shards of a paste (idempotent across workers)"""
+    db.session.execute(_insert_ignore(PasteViewShard), [
+        {'paste_id': paste_id, 'shard': shard, 'count': 0}
+        for shard in range(config.VIEW_COUNTER_SHARDS)
+    ])
+    with _rates_lock:
+        _hot_pastes.add(paste_id)
+
+
+def _insert_ignore(model):
+    """INSERT that skips rows conflicting with an existing primary key"""
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        return pg_insert(model).on_conflict_do_nothing()
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        return sqlite_insert(model).on_conflict_do_nothing()
+    return insert(model).prefix_with('IGNORE')
+
+
+def fold_view_shards():
+    """Fold shard counts back into Paste.view_count and drop shards of cooled down pastes.
+
+    Each shard is decremented by exactly the amount that was folded, so
+    increments landing while the fold runs are kept for the next one.
+    Returns the number of pastes folded.
+    """
+    rows = db.session.execute(
+        select(PasteViewShard.paste_id, PasteViewShard.shard, PasteViewShard.count)
+        .where(PasteViewShard.count > 0)
+    ).all()
+
+    folded = {}
+    for paste_id, shard, count in rows:
+        db.session.execute(
+            update(PasteViewShard)
+            .where(PasteViewShard.paste_id == paste_id, PasteViewShard.shard == shard)
+            .values(count=PasteViewShard.count - count)
+            .execution_options(synchronize_session=False)
+        )
+        folded[paste_id] = folded.get(paste_id, 0) + count
+
+    for paste_id, total in folded.items():
+        db.session.execute(
+            update(Paste)
+            .where(Paste.paste_id == paste_id)
+            .values(view_count=Paste.view_count + total)
+            .execution_options(synchronize_session=False)
+        )
+
+    # Pastes that received no views since the last fold are no longer hot
+    db.session.execute(
+        delete(PasteViewShard)
+        .where(PasteViewShard.count == 0, PasteViewShard.paste_id.not_in(list(folded)))
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return len(folded)
@@ -0,0 +1,131 @@
+from sqlalchemy import delete, select
+from snipserve import db, config, jobs
+from snipserve.models import Highlight, Paste
+from snipserve.pastes import save_content_digest
+
+try:
+    from pygments import highlight as render
+    from pygments.formatters import HtmlFormatter
+    from pygments.lexers import get_lexer_by_name, get_lexer_for_filename, guess_lexer
+    from pygments.lexers.special import TextLexer
+    from pygments.util import ClassNotFound
+except ImportError:  # Pygments is optional, clients highlight on their own without it
+    HtmlFormatter = None
+
+AUTO = 'auto'
+
+
+def available():
+    return config.HIGHLIGHT_ENABLED and HtmlFormatter is not None
+
+
+def is_known_language(name):
+    """True for 'auto' and every Pygments lexer alias"""
+    if name == AUTO:
+        return True
+    try:
+        get_lexer_by_name(name)
+    except ClassNotFound:
+        return False
+    return True
+
+
+def default_language(title):
+    """Language a paste is rendered in unless another is asked for
+
+    The lexer alias its title names as a filename ('a.py' -> 'python'), or
+    'auto' to guess from the content alone. Renderings are stored per
+    content and language, so the title can't be part of the guess itself.
+    """
+    if not title or '.' not in title:
+        return AUTO
+    try:
+        lexer = get_lexer_for_filename(title)
+    except ClassNotFound:
+        return AUTO
+    return lexer.aliases[0] if lexer.aliases else AUTO
+
+
+def choose_lexer(content, requested=AUTO):
+    """Lexer for the requested language, or a guess from a sample of the content"""
+    if requested != AUTO:
+        return get_lexer_by_name(requested)
+    try:
+        return guess_lexer(content[:config.HIGHLIGHT_DETECT_SAMPLE])
+    except ClassNotFound:
+        return TextLexer()
+
+
+def formatter():
+    return HtmlFormatter(style=config.HIGHLIGHT_STYLE, cssclass='highlight')
+
+
+def stylesheet():
+    """CSS for the rendered HTML"""
+    return formatter().get_style_defs('.highlight')
+
+
+def get_highlight(content_hash, requested=AUTO):
+    """Stored rendering (html undeferred), or None if it hasn't been rendered yet"""
+    return (
+        Highlight.query
+        .options(db.undefer(Highlight.html))
+        .filter_by(content_hash=content_hash, requested=requested)
+        .first()
+    )
+
+
+def schedule(paste, requested=None):
+    """Queue rendering of the paste's current content unless it is already stored or queued
+
+    Renders in the paste's default language unless another is requested.
+    """
+    if not available() or (paste.content_size or 0) > config.HIGHLIGHT_MAX_SIZE:
+        return None
+    requested = requested or default_language(paste.title)
+    if paste.content_hash:
+        stored = db.session.execute(
+            select(Highlight.content_hash).where(
+                Highlight.content_hash == paste.content_hash, Highlight.requested == requested
+            )
+        ).first()
+        if stored:
+            return None
+    return jobs.enqueue_unique('highlight_paste', paste_id=paste.paste_id, requested=requested)
+
+
+def render_paste(paste_id, requested=AUTO):
+    """Render a paste's content and store it under its content hash (job handler)"""
+    paste = Paste.with_content().filter_by(paste_id=paste_id).first()
+    if paste is None:
+        return None
+    content_hash, content_size = paste.content_hash, paste.content_size
+    if not content_hash:
+        # Pastes stored before content hashes existed
+        content_hash, content_size = save_content_digest(paste_id, paste.content)
+        db.session.commit()
+    existing = get_highlight(content_hash, requested)
+    if existing is not None or content_size > config.HIGHLIGHT_MAX_SIZE:
+        return existing
+
+    lexer = choose_lexer(paste.content, requested)
+    stored = Highlight(
+        content_hash=content_hash,
+        requested=requested,
+        language=lexer.aliases[0] if lexer.aliases else lexer.name,
+        html=render(paste.content, lexer, formatter()),
+    )
+    db.session.merge(stored)
+    db.session.commit()
+    return stored
+
+
+def prune():
+    """Drop renderings no paste has the content of anymore"""
+    result = db.session.execute(
+        delete(Highlight)
+        .where(Highlight.content_hash.not_in(select(Paste.content_hash).where(Paste.content_hash.is_not(None))))
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount
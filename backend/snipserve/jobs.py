@@ -0,0 +1,219 @@
+import json
+import logging
+import threading
+import traceback
+from datetime import datetime, timedelta
+from sqlalchemy import and_, func, or_, select, update
+from snipserve import db, config
+from snipserve.models import Job
+
+logger = logging.getLogger(__name__)
+
+# kind -> (handler, max_attempts)
+HANDLERS = {}
+# kind -> interval in seconds, for jobs the worker schedules by itself
+PERIODIC = {}
+
+_wakeup = threading.Event()
+_worker = None
+_worker_lock = threading.Lock()
+_last_scheduled = {}
+
+
+def job(kind, max_attempts=3, every=None):
+    """Register a function as the handler for a job kind.
+
+    Handlers receive the job payload as keyword arguments and must be safe to
+    run again, since failed jobs are retried. With `every`, the worker also
+    queues the job on its own every `every` seconds.
+    """
+    def decorator(f):
+        HANDLERS[kind] = (f, max_attempts)
+        if every:
+            PERIODIC[kind] = every
+        return f
+    return decorator
+
+
+def enqueue(kind, delay=0, **payload):
+    """Queue a job and return it. Commits the current session."""
+    _, max_attempts = HANDLERS[kind]
+    new_job = Job(
+        kind=kind,
+        payload=json.dumps(payload, sort_keys=True),
+        max_attempts=max_attempts,
+        run_after=datetime.utcnow() + timedelta(seconds=delay),
+    )
+    db.session.add(new_job)
+    db.session.commit()
+    _wakeup.set()
+    return new_job
+
+
+def claim_next():
+    """Atomically move the next runnable job to 'running' and return it, or None"""
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=config.JOB_TIMEOUT)
+
+    # Jobs whose worker died on their last attempt are given up on
+    db.session.execute(
+        update(Job)
+        .where(Job.status == 'running', Job.locked_at < stale, Job.attempts >= Job.max_attempts)
+        .values(status='failed', finished_at=now, last_error='Timed out')
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+    runnable = or_(
+        and_(Job.status == 'queued', Job.run_after <= now),
+        and_(Job.status == 'running', Job.locked_at < stale),
+    )
+    candidates = db.session.execute(
+        select(Job.id).where(runnable).order_by(Job.run_after, Job.id).limit(10)
+    ).scalars().all()
+
+    for job_id in candidates:
+        # Conditional update: only one worker wins each job
+        result = db.session.execute(
+            update(Job)
+            .where(Job.id == job_id, runnable)
+            .values(status='running', locked_at=now, attempts=Job.attempts + 1)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        if result.rowcount:
+            return db.session.get(Job, job_id)
+    return None
+
+
+def run_job(claimed):
+    """Run a claimed job, recording success, a retry or the final failure"""
+    job_id = claimed.id
+    handler, _ = HANDLERS.get(claimed.kind, (None, None))
+    try:
+        if handler is None:
+            raise LookupError(f'No handler registered for job kind {claimed.kind!r}')
+        handler(**json.loads(claimed.payload))
+    except Exception:
+        db.session.rollback()
+        logger.exception('Job %s (%s) failed', job_id, claimed.kind)
+        failed = db.session.get(Job, job_id)
+        failed.last_error = traceback.format_exc(limit=5)
+        if failed.attempts >= failed.max_attempts:
+            failed.status = 'failed'
+            failed.finished_at = datetime.utcnow()
+        else:
+            failed.status = 'queued'
+            delay = config.JOB_RETRY_DELAY * 2 ** (failed.attempts - 1)
+            failed.run_after = datetime.utcnow() + timedelta(seconds=delay)
+        db.session.commit()
+        return False
+
+    done = db.session.get(Job, job_id)
+    done.status = 'done'
+    done.finished_at = datetime.utcnow()
+    done.last_error = None
+    db.session.commit()
+    return True
+
+
+def run_pending(limit=None):
+    """Run runnable jobs until the queue is drained (or `limit` jobs ran)"""
+    ran = 0
+    while limit is None or ran < limit:
+        claimed = claim_next()
+        if claimed is None:
+            break
+        run_job(claimed)
+        ran += 1
+    return ran
+
+
+def enqueue_unique(kind, **payload):
+    """Queue a job unless one of the same kind and payload is already queued or running
+
+    Returns the new job, or the pending one so callers always have a job to report.
+    """
+    pending = (
+        Job.query
+        .filter(
+            Job.kind == kind,
+            Job.payload == json.dumps(payload, sort_keys=True),
+            Job.status.in_(('queued', 'running')),
+        )
+        .order_by(Job.id)
+        .first()
+    )
+    if pending is not None:
+        return pending
+    return enqueue(kind, **payload)
+
+
+def schedule_periodic():
+    """Queue periodic jobs that are due and not already queued or running"""
+    now = datetime.utcnow()
+    for kind, interval in PERIODIC.items():
+        last = _last_scheduled.get(kind)
+        if last and (now - last).total_seconds() < interval:
+            continue
+        _last_scheduled[kind] = now
+        enqueue_unique(kind)
+
+
+def queue_stats():
+    """Queue depth and job counts per status"""
+    counts = dict(db.session.execute(select(Job.status, func.count(Job.id)).group_by(Job.status)).all())
+    oldest = db.session.execute(select(func.min(Job.run_after)).where(Job.status == 'queued')).scalar()
+    return {
+        'depth': counts.get('queued', 0) + counts.get('running', 0),
+        'by_status': {status: counts.get(status, 0) for status in ('queued', 'running', 'done', 'failed')},
+        'oldest_queued_at': oldest.isoformat() if oldest else None,
+    }
+
+
+class Worker(threading.Thread):
+    """Polls the job table and runs jobs inside the web process"""
+
+    def __init__(self, app):
+        super().__init__(name='snipserve-jobs', daemon=True)
+        self.app = app
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.is_set():
+            with self.app.app_context():
+                try:
+                    schedule_periodic()
+                    run_pending()
+                except Exception:
+                    logger.exception('Job worker iteration failed')
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+            _wakeup.wait(config.JOB_POLL_INTERVAL)
+            _wakeup.clear()
+
+    def stop(self):
+        self._stopped.set()
+        _wakeup.set()
+
+
+def start_worker(app):
+    """Start this process' in-process worker thread (once)"""
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = Worker(app)
+            _worker.start()
+    return _worker
+
+
+def init_app(app):
+    if not config.JOB_WORKER_INPROCESS:
+        return
+
+    # Started lazily so CLI commands and pre-fork imports don't spawn threads
+    @app.before_request
+    def ensure_job_worker():
+        if _worker is None:
+            start_worker(app)
@@ -0,0 +1,66 @@
+from datetime import date, datetime, time
+from importlib import import_module
+from flask.json.provider import DefaultJSONProvider, _default as flask_default
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back to the stdlib encoder
+    orjson = None
+
+
+def _default(obj):
+    """Serialize dates the same way the models do (isoformat), defer the rest to Flask"""
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    return flask_default(obj)
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """Flask's stdlib provider, but with isoformat() datetimes instead of HTTP dates"""
+    default = staticmethod(_default)
+
+
+class OrjsonProvider(StdlibJSONProvider):
+    """JSON provider backed by orjson, producing output compatible with StdlibJSONProvider"""
+
+    def _options(self):
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return option
+
+    def dumps(self, obj, **kwargs):
+        # Formatting options (indent, separators...) are only supported by the stdlib encoder
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._options()).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self._options() | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+PROVIDERS = {
+    'stdlib': StdlibJSONProvider,
+    'orjson': OrjsonProvider,
+}
+
+
+def get_json_provider_class(name):
+    """Resolve a JSON provider by short name or 'package.module:ClassName'"""
+    if ':' in name:
+        module_name, class_name = name.split(':', 1)
+        return getattr(import_module(module_name), class_name)
+    if name not in PROVIDERS:
+        raise ValueError(f'Unknown JSON provider: {name}')
+    if name == 'orjson' and orjson is None:
+        return StdlibJSONProvider
+    return PROVIDERS[name]
@@ -1,10 +1,15 @@
 from sqlalchemy import DateTime
 from datetime import datetime
+import json
 import secrets
 import string
 from snipserve import db
+from snipserve.uploads import content_digest
 from flask_login import UserMixin
 
+# password_hash of an account queued for deletion: no password matches it
+DISABLED_PASSWORD_HASH = '!'
+
 
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
@@ -20,6 +25,10 @@ class User(db.Model, UserMixin):
     def __repr__(self):
         return f'<User {self.username}>'
 
+    @property
+    def is_disabled(self):
+        return self.password_hash == DISABLED_PASSWORD_HASH
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -33,20 +42,55 @@ class Paste(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     paste_id = db.Column(db.String(10), unique=True, nullable=False, index=True)
     title = db.Column(db.String(255), nullable=False)
-    content = db.Column(db.Text, nullable=False)
+    # Deferred: metadata queries (ownership checks, view counts, analytics) never pull the body
+    content = db.deferred(db.Column(db.Text, nullable=False))
+    # SHA-256 and UTF-8 size of content, computed as it is received
+    content_hash = db.Column(db.String(64), nullable=True)
+    content_size = db.Column(db.Integer, nullable=True)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp(), nullable=False)
     updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp(), nullable=False)
     hidden = db.Column(db.Boolean, default=False, nullable=False)
     view_count = db.Column(db.Integer, default=0, nullable=False)
+    # Null for pastes that never expire; indexed for the read filter and the sweeper
+    expires_at = db.Column(db.DateTime, nullable=True, index=True)
+    # Bumped by every ORM update of the row; edits name the version they started from.
+    # The server default lets the column be added to a table that already has pastes
+    version = db.Column(db.Integer, nullable=False, server_default='1')
     
     # Foreign key to User
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
+    # UPDATEs include WHERE version = <loaded version>, so a concurrent edit fails with StaleDataError
+    __mapper_args__ = {'version_id_col': version}
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         if not self.paste_id:
             self.paste_id = self.generate_paste_id()
 
+    @classmethod
+    def unexpired(cls):
+        """Condition excluding expired pastes, which linger until the sweeper purges them"""
+        return db.or_(cls.expires_at.is_(None), cls.expires_at > datetime.utcnow())
+
+    @classmethod
+    def live(cls):
+        """Query of pastes that haven't expired"""
+        return cls.query.filter(cls.unexpired())
+
+    @classmethod
+    def with_content(cls):
+        """Query that loads the deferred content column together with the row"""
+        return cls.query.options(db.undefer(cls.content))
+
+    def set_content(self, content, content_hash=None, content_size=None):
+        """Replace the content; hash and size are computed unless the upload already did"""
+        if content_hash is None or content_size is None:
+            content_hash, content_size = content_digest(content)
+        self.content = content
+        self.content_hash = content_hash
+        self.content_size = content_size
+
     @staticmethod
     def generate_paste_id():
         """Generate a unique 8-character alphanumeric ID"""
@@ -60,17 +104,24 @@ class Paste(db.Model):
     def __repr__(self):
         return f'<Paste {self.title}>'
 
-    def to_dict(self):
-        return {
+    def to_dict(self, include_content=True):
+        data = {
             'id': self.paste_id,  # Use paste_id as the public ID
             'title': self.title,
-            'content': self.content,
             'created_at': self.created_at.isoformat(),
             'hidden': self.hidden,
             'user_id': self.user_id,
             'username': self.user.username if self.user else None,
-            'view_count': self.view_count  # Include view count
+            'view_count': self.total_view_count,  # Include view count, shards not folded yet included
+            'version': self.version,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+            'content_size': self.content_size,
+            'content_hash': self.content_hash,
         }
+        if include_content:
+            # Triggers a separate load of the deferred column unless it was undeferred
+            data['content'] = self.content
+        return data
 
 
 class PasteView(db.Model):
@@ -79,11 +130,148 @@ class PasteView(db.Model):
     paste_id = db.Column(db.String(10), db.ForeignKey('paste.paste_id', ondelete='CASCADE'), nullable=False)
     ip_address = db.Column(db.String(45), nullable=False)  # IPv6 support
     user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='SET NULL'), nullable=True)  # Null for anonymous users
-    viewed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # Indexed for the dashboard's views-in-the-last-week counts
+    viewed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
     
     # Relationships with proper cascade behavior
     paste = db.relationship('Paste', backref=db.backref('views', cascade='all, delete-orphan'))
     user = db.relationship('User', backref=db.backref('paste_views', cascade='all, delete-orphan'))
 
     def __repr__(self):
-        return f'<PasteView {self.paste_id} by {self.user_id or self.ip_address}>'
\ No newline at end of file
+        return f'<PasteView {self.paste_id} by {self.user_id or self.ip_address}>'
+
+
+class PasteViewShard(db.Model):
+    """Spread view_count increments of hot pastes over several rows to avoid lock contention"""
+    paste_id = db.Column(db.String(10), db.ForeignKey('paste.paste_id', ondelete='CASCADE'), primary_key=True)
+    shard = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    count = db.Column(db.Integer, default=0, nullable=False)
+
+    paste = db.relationship('Paste', backref=db.backref('view_shards', cascade='all, delete-orphan'))
+
+    def __repr__(self):
+        return f'<PasteViewShard {self.paste_id}#{self.shard}: {self.count}>'
+
+
+# The view count clients see: Paste.view_count plus shard counts the fold job
+# hasn't moved into it yet (see snipserve.counters)
+Paste.total_view_count = db.column_property(
+    Paste.view_count
+    + db.select(db.func.coalesce(db.func.sum(PasteViewShard.count), 0))
+    .where(PasteViewShard.paste_id == Paste.paste_id)
+    .correlate_except(PasteViewShard)
+    .scalar_subquery()
+)
+
+
+class TrendingScore(db.Model):
+    """Persisted time-decayed popularity of a paste, in log space (see snipserve.trending)"""
+    paste_id = db.Column(db.String(10), db.ForeignKey('paste.paste_id', ondelete='CASCADE'), primary_key=True)
+    score = db.Column(db.Float, nullable=False, index=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    paste = db.relationship('Paste', backref=db.backref('trending_score', cascade='all, delete-orphan'))
+
+    def __repr__(self):
+        return f'<TrendingScore {self.paste_id}: {self.score:.3f}>'
+
+
+class PasteRevision(db.Model):
+    """One saved version of a paste; content is a line delta against the previous revision or a full snapshot"""
+    __table_args__ = (db.UniqueConstraint('paste_id', 'number'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    paste_id = db.Column(db.String(10), db.ForeignKey('paste.paste_id', ondelete='CASCADE'), nullable=False, index=True)
+    number = db.Column(db.Integer, nullable=False)  # 1 for the original content, then one per edit
+    title = db.Column(db.String(255), nullable=False)
+    is_snapshot = db.Column(db.Boolean, default=False, nullable=False)
+    # Full text for snapshots, JSON encoded delta otherwise; not needed to list revisions
+    data = db.deferred(db.Column(db.Text, nullable=False))
+    content_hash = db.Column(db.String(64), nullable=True)
+    content_size = db.Column(db.Integer, nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='SET NULL'), nullable=True)  # Who saved it
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    paste = db.relationship('Paste', backref=db.backref('revisions', cascade='all, delete-orphan'))
+
+    def __repr__(self):
+        return f'<PasteRevision {self.paste_id}@{self.number}>'
+
+    def to_dict(self):
+        return {
+            'number': self.number,
+            'title': self.title,
+            'created_at': self.created_at.isoformat(),
+            'user_id': self.user_id,
+            'content_size': self.content_size,
+            'content_hash': self.content_hash,
+        }
+
+
+
+class Highlight(db.Model):
+    """Syntax highlighted HTML of a paste body, shared by all pastes with the same content"""
+    content_hash = db.Column(db.String(64), primary_key=True)
+    requested = db.Column(db.String(64), primary_key=True)  # language asked for, 'auto' to detect it
+    language = db.Column(db.String(64), nullable=False)  # Pygments lexer that was used
+    html = db.deferred(db.Column(db.Text, nullable=False))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f'<Highlight {self.content_hash[:12]} {self.language}>'
+
+
+class Job(db.Model):
+    """Deferred work picked up by the job runner outside the request path"""
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(64), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')  # JSON encoded keyword arguments
+    status = db.Column(db.String(16), nullable=False, default='queued', index=True)  # queued, running, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<Job {self.id} {self.kind} {self.status}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+
+class SiteStats(db.Model):
+    """Single row of admin dashboard aggregates, refreshed by a periodic job"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_count = db.Column(db.Integer, default=0, nullable=False)
+    paste_count = db.Column(db.Integer, default=0, nullable=False)
+    total_views = db.Column(db.Integer, default=0, nullable=False)
+    recent_views = db.Column(db.Integer, default=0, nullable=False)  # Last 7 days
+    storage_bytes = db.Column(db.BigInteger, default=0, nullable=False)
+    top_pastes = db.Column(db.Text, nullable=False, default='[]')  # JSON encoded
+    recent_users = db.Column(db.Text, nullable=False, default='[]')  # JSON encoded
+    refreshed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def to_dict(self):
+        return {
+            'total_users': self.user_count,
+            'total_pastes': self.paste_count,
+            'total_views': self.total_views,
+            'recent_activity': self.recent_views,
+            'storage_bytes': self.storage_bytes,
+            'top_pastes': json.loads(self.top_pastes),
+            'recent_users': json.loads(self.recent_users),
+            'refreshed_at': self.refreshed_at.isoformat(),
+        }
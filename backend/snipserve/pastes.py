@@ -0,0 +1,141 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import delete, select, update
+from snipserve import db, config
+from snipserve.cache import make_cache
+from snipserve.models import Paste, PasteRevision, PasteView, PasteViewShard, TrendingScore
+from snipserve.uploads import content_digest
+
+# content_hash -> content of recently viewed pastes. Content-addressed, so an
+# entry never goes stale and nothing needs invalidating in other workers.
+content_cache = make_cache(
+    'paste_content',
+    maxsize=config.PASTE_CACHE_SIZE,
+    ttl=config.PASTE_CACHE_TTL,
+    item_size=config.PASTE_CACHE_ITEM_SIZE,
+)
+
+
+def get_paste_payload(paste_id):
+    """Serialized paste (content included), or None if it doesn't exist
+
+    The row (hidden flag, version, view count...) is always read from the
+    database, so edits, hiding and deletion show up in every worker at
+    once; only the content comes from the content cache.
+    """
+    paste = Paste.live().options(db.joinedload(Paste.user)).filter_by(paste_id=paste_id).first()
+    if paste is None:
+        return None
+    data = paste.to_dict(include_content=False)
+    content = content_cache.get(paste.content_hash) if paste.content_hash else None
+    if content is None:
+        content = paste.content
+        # Only content that matches its hash is cached, whichever database
+        # (primary or a lagging replica) it was read from
+        if (
+            paste.content_hash
+            and len(content) <= config.PASTE_CACHE_ITEM_SIZE
+            and content_digest(content)[0] == paste.content_hash
+        ):
+            content_cache.set(paste.content_hash, content)
+    data['content'] = content
+    return data
+
+
+def parse_expiry(data):
+    """Expiry of a new paste from an 'expires_at' timestamp or 'expires_in' seconds, or None
+
+    Returns a naive UTC datetime like the rest of the schema. Raises
+    ValueError for malformed values, out of range ones and expiry times
+    that have passed.
+    """
+    try:
+        return _parse_expiry(data)
+    except OverflowError:
+        raise ValueError('Expiry is out of range')
+
+
+def _parse_expiry(data):
+    if data.get('expires_at'):
+        expires_at = datetime.fromisoformat(str(data['expires_at']).replace('Z', '+00:00'))
+        if expires_at.tzinfo is not None:
+            expires_at = expires_at.astimezone(timezone.utc).replace(tzinfo=None)
+    elif data.get('expires_in') not in (None, ''):
+        # 0 is a value like any other (and rejected below), not "never expires"
+        expires_at = datetime.utcnow() + timedelta(seconds=float(data['expires_in']))
+    else:
+        return None
+    if expires_at <= datetime.utcnow():
+        raise ValueError('Expiry must be in the future')
+    return expires_at
+
+
+def delete_pastes(paste_ids):
+    """Bulk delete pastes with their views, counter shards, revisions and scores (committed by the caller)"""
+    for model in (PasteView, PasteViewShard, PasteRevision, TrendingScore):
+        db.session.execute(
+            delete(model).where(model.paste_id.in_(paste_ids)).execution_options(synchronize_session=False)
+        )
+    db.session.execute(
+        delete(Paste).where(Paste.paste_id.in_(paste_ids)).execution_options(synchronize_session=False)
+    )
+
+
+def purge_expired(batch_size=None):
+    """Delete expired pastes, oldest expiry first, one bounded batch per transaction
+
+    Each batch is found through the expires_at index, so a sweep only
+    touches expired rows and holds its locks for one batch at a time.
+    Returns the number of pastes deleted.
+    """
+    batch_size = batch_size or config.JOB_BATCH_SIZE
+    now = datetime.utcnow()
+    purged = 0
+    while True:
+        paste_ids = db.session.execute(
+            select(Paste.paste_id)
+            .where(Paste.expires_at <= now)
+            .order_by(Paste.expires_at)
+            .limit(batch_size)
+        ).scalars().all()
+        if not paste_ids:
+            break
+        delete_pastes(paste_ids)
+        db.session.commit()
+        purged += len(paste_ids)
+    return purged
+
+
+def save_content_digest(paste_id, content):
+    """Store the hash and size of a paste's content and return them (committed by the caller)
+
+    A bulk UPDATE, so neither the version an editor may hold nor updated_at
+    (the my-pastes order) changes.
+    """
+    content_hash, content_size = content_digest(content)
+    db.session.execute(
+        update(Paste)
+        .where(Paste.paste_id == paste_id)
+        .values(content_hash=content_hash, content_size=content_size, updated_at=Paste.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    return content_hash, content_size
+
+
+def backfill_content_digests(batch_size=None):
+    """Fill in content_hash and content_size of pastes stored before they existed
+
+    One bounded batch per transaction. Returns the number of pastes updated.
+    """
+    batch_size = batch_size or config.JOB_BATCH_SIZE
+    filled = 0
+    while True:
+        rows = db.session.execute(
+            select(Paste.paste_id, Paste.content).where(Paste.content_size.is_(None)).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        for paste_id, content in rows:
+            save_content_digest(paste_id, content)
+        db.session.commit()
+        filled += len(rows)
+    return filled
@@ -0,0 +1,160 @@
+import logging
+import random
+import threading
+import time
+from functools import wraps
+from flask import g, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.sql import Select
+from snipserve import config
+from snipserve.cache import make_cache
+
+logger = logging.getLogger(__name__)
+
+_replicas = []
+_replicas_lock = threading.Lock()
+
+# ('user', id) / ('paste', paste_id) / ('api_key', key) -> time of the last write
+recent_writes = make_cache('recent_writes', maxsize=100000, ttl=config.READ_YOUR_WRITES_SECONDS, item_size=128)
+
+
+class Replica:
+    """A read replica engine with its cached health and replication lag"""
+
+    def __init__(self, url):
+        self.url = url
+        self.engine = create_engine(url, pool_pre_ping=True)
+        self.checked_at = 0
+        self.lag = 0.0
+        self.healthy = True
+
+    def usable(self):
+        if time.monotonic() - self.checked_at > config.REPLICA_CHECK_INTERVAL:
+            self.check()
+        return self.healthy and self.lag <= config.REPLICA_MAX_LAG_SECONDS
+
+    def check(self):
+        self.checked_at = time.monotonic()
+        try:
+            self.lag = replication_lag(self.engine)
+            self.healthy = True
+        except Exception:
+            logger.warning('Read replica %s is unavailable', self.engine.url, exc_info=True)
+            self.healthy = False
+
+    def mark_unhealthy(self):
+        self.healthy = False
+        self.checked_at = time.monotonic()
+
+
+def replication_lag(engine):
+    """Seconds the replica is behind its primary (0 when the database can't tell)"""
+    if engine.dialect.name != 'postgresql':
+        with engine.connect() as conn:
+            conn.execute(text('SELECT 1'))
+        return 0.0
+    with engine.connect() as conn:
+        return float(conn.execute(text(
+            'SELECT COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)'
+        )).scalar())
+
+
+def configure(urls):
+    """Replace the set of read replicas"""
+    global _replicas
+    with _replicas_lock:
+        for replica in _replicas:
+            replica.engine.dispose()
+        _replicas = [Replica(url) for url in urls]
+
+
+def dispose_engines(close=True):
+    """Reset replica connection pools, e.g. in a freshly forked worker (close=False)"""
+    for replica in _replicas:
+        replica.engine.dispose(close=close)
+
+
+def choose_replica():
+    """A random usable replica, or None to read from the primary"""
+    usable = [replica for replica in _replicas if replica.usable()]
+    return random.choice(usable) if usable else None
+
+
+def mark_write(user_id=None, paste_id=None, api_key=None):
+    """Keep follow-up reads by this user or of this paste on the primary for a while
+
+    api_key marks requests authenticating with that key, whose user lookup
+    runs before the user is known (e.g. a key that was just created).
+    """
+    now = time.time()
+    if user_id is not None:
+        recent_writes.set(('user', user_id), now)
+    if paste_id is not None:
+        recent_writes.set(('paste', paste_id), now)
+    if api_key is not None:
+        recent_writes.set(('api_key', api_key), now)
+    # Browser sessions carry the marker across gunicorn workers; API key
+    # clients have no session and mustn't be handed a cookie for it
+    if session:
+        session['last_write'] = now
+
+
+def _recently_wrote():
+    last_write = session.get('last_write')
+    if last_write and time.time() - last_write < config.READ_YOUR_WRITES_SECONDS:
+        return True
+    api_key = request.headers.get('X-API-Key') or request.args.get('api_key')
+    if api_key and recent_writes.get(('api_key', api_key)) is not None:
+        return True
+    user = g.get('current_user')
+    if user is not None and recent_writes.get(('user', user.id)):
+        return True
+    paste_id = (request.view_args or {}).get('paste_id')
+    return paste_id is not None and recent_writes.get(('paste', paste_id)) is not None
+
+
+class RoutingSession(Session):
+    """Session that sends SELECTs of read-only routes to a read replica"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and not self._flushing
+            and isinstance(clause, Select)
+            and g.get('read_replica')
+            and not _recently_wrote()
+        ):
+            if 'replica' not in g:
+                g.replica = choose_replica()
+            if g.replica is not None:
+                return g.replica.engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_replica(f):
+    """Allow a read-only route to be served from a replica, falling back to the primary"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not _replicas:
+            return f(*args, **kwargs)
+        g.read_replica = True
+        try:
+            return f(*args, **kwargs)
+        except OperationalError:
+            replica = g.pop('replica', None)
+            if replica is None:
+                raise
+            logger.warning('Read replica %s failed, retrying on the primary', replica.engine.url, exc_info=True)
+            replica.mark_unhealthy()
+            from snipserve import db
+            db.session.rollback()
+            g.read_replica = False
+            return f(*args, **kwargs)
+
+    return decorated_function
+
+
+def init_app(app):
+    configure(config.REPLICA_DATABASE_URLS)
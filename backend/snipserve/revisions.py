@@ -0,0 +1,177 @@
+import difflib
+import json
+from sqlalchemy import func, select
+from snipserve import db, config
+from snipserve.models import PasteRevision
+from snipserve.uploads import content_digest
+
+
+def make_delta(old, new):
+    """Line delta from old to new
+
+    A list of operations applied in order to the lines of old: a positive int
+    copies that many lines, a negative int skips them and a list of strings
+    is inserted as is.
+    """
+    a = old.splitlines(keepends=True)
+    b = new.splitlines(keepends=True)
+    delta = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b).get_opcodes():
+        if tag == 'equal':
+            delta.append(i2 - i1)
+            continue
+        if i2 > i1:
+            delta.append(i1 - i2)
+        if j2 > j1:
+            delta.append(b[j1:j2])
+    return delta
+
+
+def apply_delta(lines, delta):
+    """Lines of the new version, from the lines of the old one and make_delta's output"""
+    result = []
+    pos = 0
+    for op in delta:
+        if isinstance(op, list):
+            result.extend(op)
+        elif op > 0:
+            result.extend(lines[pos:pos + op])
+            pos += op
+        else:
+            pos -= op
+    return result
+
+
+def apply_line_edits(content, edits):
+    """Apply (start, end, text) line range edits to content
+
+    Each edit replaces lines start..end (0-based, end exclusive, line endings
+    included) of the original content with text. Edits must be sorted and
+    must not overlap. Returns the new content and the equivalent delta, so
+    the revision doesn't have to be diffed again.
+    """
+    lines = content.splitlines(keepends=True)
+    result = []
+    delta = []
+    pos = 0
+    for start, end, text in edits:
+        if not pos <= start <= end <= len(lines):
+            raise ValueError(f'Edit of lines {start}-{end} is out of order or out of range')
+        if start > pos:
+            delta.append(start - pos)
+            result.extend(lines[pos:start])
+        if end > start:
+            delta.append(start - end)
+        inserted = text.splitlines(keepends=True)
+        if inserted:
+            delta.append(inserted)
+            result.extend(inserted)
+        pos = end
+    if pos < len(lines):
+        delta.append(len(lines) - pos)
+        result.extend(lines[pos:])
+    return ''.join(result), delta
+
+
+def _add_revision(paste_id, number, title, data, is_snapshot, content_hash, content_size, user_id):
+    revision = PasteRevision(
+        paste_id=paste_id,
+        number=number,
+        title=title,
+        data=data,
+        is_snapshot=is_snapshot,
+        content_hash=content_hash,
+        content_size=content_size,
+        user_id=user_id,
+    )
+    db.session.add(revision)
+    return revision
+
+
+def record_revision(paste, user_id=None, previous=None, delta=None):
+    """Add the paste's current title and content as its newest revision (committed by the caller)
+
+    previous is the (title, content) the edit started from and the base of
+    the delta. Nothing is stored when a paste is created: its first edit
+    saves previous as revision 1, so pastes that are never edited cost no
+    extra storage. Every REVISION_SNAPSHOT_INTERVAL revisions, and whenever
+    the delta wouldn't be smaller than the text, the full content is stored
+    instead so reconstruction never replays a long chain. A delta
+    the caller already has (see apply_line_edits) is used as is.
+    """
+    number = db.session.execute(
+        select(func.max(PasteRevision.number)).where(PasteRevision.paste_id == paste.paste_id)
+    ).scalar()
+    if number is None and previous is not None:
+        title, content = previous
+        first = _add_revision(paste.paste_id, 1, title, content, True, *content_digest(content), paste.user_id)
+        first.created_at = paste.created_at
+        number = 1
+    number = (number or 0) + 1
+
+    data = paste.content
+    is_snapshot = previous is None or (number - 1) % config.REVISION_SNAPSHOT_INTERVAL == 0
+    if not is_snapshot:
+        if delta is None:
+            delta = make_delta(previous[1], paste.content)
+        delta = json.dumps(delta, ensure_ascii=False, separators=(',', ':'))
+        if len(delta) < len(paste.content):
+            data = delta
+        else:
+            is_snapshot = True
+    return _add_revision(
+        paste.paste_id, number, paste.title, data, is_snapshot, paste.content_hash, paste.content_size, user_id
+    )
+
+
+def initial_revision(paste):
+    """Revision 1 of a paste that was never edited, which is just the paste itself"""
+    return PasteRevision(
+        paste_id=paste.paste_id,
+        number=1,
+        title=paste.title,
+        created_at=paste.created_at,
+        user_id=paste.user_id,
+        content_size=paste.content_size,
+        content_hash=paste.content_hash,
+    )
+
+
+def list_revisions(paste_id):
+    """Revision metadata of a paste, newest first"""
+    return (
+        PasteRevision.query
+        .filter_by(paste_id=paste_id)
+        .order_by(PasteRevision.number.desc())
+        .all()
+    )
+
+
+def get_revision(paste_id, number):
+    """(revision, content) for one revision of a paste, or None
+
+    Content is rebuilt from the closest snapshot at or before the revision
+    plus the deltas that follow it.
+    """
+    snapshot = db.session.execute(
+        select(func.max(PasteRevision.number)).where(
+            PasteRevision.paste_id == paste_id,
+            PasteRevision.is_snapshot.is_(True),
+            PasteRevision.number <= number,
+        )
+    ).scalar()
+    if snapshot is None:
+        return None
+    chain = (
+        PasteRevision.query
+        .options(db.undefer(PasteRevision.data))
+        .filter(PasteRevision.paste_id == paste_id, PasteRevision.number.between(snapshot, number))
+        .order_by(PasteRevision.number)
+        .all()
+    )
+    if not chain or chain[-1].number != number:
+        return None
+    lines = chain[0].data.splitlines(keepends=True)
+    for revision in chain[1:]:
+        lines = apply_delta(lines, json.loads(revision.data))
+    return chain[-1], ''.join(lines)
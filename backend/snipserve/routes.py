@@ -1,58 +1,124 @@
 from flask import (
-    Blueprint, request, jsonify, redirect, url_for, session, g
+    Blueprint, request, jsonify, redirect, url_for, session, g, current_app, stream_with_context
 )
 import os
 import json
 from datetime import datetime, timedelta
-from snipserve import app, db, login_manager, bcrypt, config
-from snipserve.models import Paste, User, PasteView
-from snipserve.auth import auth_required, api_key_required, get_current_user, optional_auth
+from sqlalchemy import select
+from sqlalchemy.orm.exc import StaleDataError
+from snipserve import db, login_manager, bcrypt, config, counters, highlight, jobs, stats, trending
+from snipserve.replicas import read_replica, mark_write
+from snipserve.pastes import get_paste_payload, parse_expiry
+from snipserve.transfer import export_pastes, import_pastes
+from snipserve.revisions import apply_line_edits, record_revision, initial_revision, list_revisions, get_revision
+from snipserve.uploads import UploadTooLarge, content_digest, read_paste_request
+from snipserve.models import DISABLED_PASSWORD_HASH, Paste, User, PasteView, Job
+from snipserve.auth import (
+    auth_required, api_key_required, get_current_user, optional_auth, load_user_identity, invalidate_user
+)
 from flask_login import (
     login_user, logout_user, login_required, current_user
 )
 import secrets
 
-@app.route('/api/pastes/create', methods=['POST'])
+bp = Blueprint('api', __name__)
+
+@bp.route('/api/pastes/create', methods=['POST'])
 @auth_required
 def create_paste():
-    data = request.get_json()
-    if not data or 'title' not in data or 'content' not in data:
+    # JSON, or a raw text/plain / multipart body streamed to a spool file
+    try:
+        data, upload = read_paste_request(request)
+    except UploadTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    if not data or 'title' not in data or ('content' not in data and upload is None):
+        if upload is not None:
+            upload.close()
         return jsonify({'error': 'Invalid input'}), 400
     
+    try:
+        expires_at = parse_expiry(data)
+    except (TypeError, ValueError) as e:
+        if upload is not None:
+            upload.close()
+        return jsonify({'error': f'Invalid expiry: {e}'}), 400
+    
     user = get_current_user()
     # Create paste with current user as owner
     paste = Paste(
         title=data['title'], 
-        content=data['content'], 
         created_at=data.get('created_at'), 
         hidden=data.get('hidden', False),
+        expires_at=expires_at,
         user_id=user.id  # Assign to current user
     )
+    error = set_paste_content(paste, data, upload)
+    if error:
+        return error
     db.session.add(paste)
     db.session.commit()
+    mark_write(user_id=user.id, paste_id=paste.paste_id)
+    highlight.schedule(paste)
     
-    return jsonify(paste.to_dict()), 201
+    # Uploaded content isn't echoed back
+    return jsonify(paste.to_dict(include_content=upload is None)), 201
+
+
+def set_paste_content(paste, data, upload):
+    """Store JSON or uploaded content on the paste; returns an error response or None"""
+    if upload is not None:
+        try:
+            content = upload.read_text()
+        except UnicodeDecodeError:
+            return jsonify({'error': 'Paste content must be UTF-8 text'}), 400
+        finally:
+            upload.close()
+        paste.set_content(content, upload.hash, upload.size)
+    elif 'content' in data:
+        content_hash, content_size = content_digest(data['content'])
+        if content_size > config.MAX_PASTE_SIZE:
+            return jsonify({'error': f'Paste content exceeds {config.MAX_PASTE_SIZE} bytes'}), 413
+        paste.set_content(data['content'], content_hash, content_size)
+    return None
+
+
+@bp.app_errorhandler(413)
+def request_too_large(e):
+    """Bodies over MAX_CONTENT_LENGTH, answered in the API's JSON error format"""
+    return jsonify({'error': f'Request body exceeds {current_app.config["MAX_CONTENT_LENGTH"]} bytes'}), 413
+
+@bp.route('/api/pastes/trending', methods=['GET'])
+@read_replica
+def get_trending_pastes():
+    """Public pastes with the most recent views, scored with time decay"""
+    limit = request.args.get('limit', config.TRENDING_SIZE, type=int)
+    return jsonify({'pastes': trending.get_trending(limit)}), 200
 
-@app.route('/api/pastes/<string:paste_id>')
+
+@bp.route('/api/pastes/<string:paste_id>')
+@read_replica
 @optional_auth
 def get_paste(paste_id):
-    paste = Paste.query.filter_by(paste_id=paste_id).first()
+    paste = get_paste_payload(paste_id)
     if not paste:
         return jsonify({'error': 'Paste not found'}), 404
     
     # Check if user is authenticated (either session or API key)
     user = get_current_user()
     # Allow access if paste is public OR user owns it OR user is admin
-    available = not paste.hidden or (user and (user.id == paste.user_id or user.is_admin))
+    available = not paste['hidden'] or (user and (user.id == paste['user_id'] or user.is_admin))
     if not available:
         return jsonify({'error': 'Paste is hidden'}), 403
-    return jsonify(paste.to_dict()), 200
+    # Hot pastes are served repeatedly, keep their compressed bodies around
+    g.cache_compressed = True
+    return jsonify(paste), 200
 
 
-@app.route('/api/pastes/<string:paste_id>', methods=['PUT'])
+@bp.route('/api/pastes/<string:paste_id>', methods=['PUT'])
 @auth_required
 def update_paste(paste_id):
-    paste = Paste.query.filter_by(paste_id=paste_id).first()
+    # Content (the base of the new revision's delta) is only loaded once the edit is allowed
+    paste = Paste.live().filter_by(paste_id=paste_id).first()
     if not paste:
         return jsonify({'error': 'Paste not found'}), 404
     
@@ -61,22 +127,206 @@ def update_paste(paste_id):
     if paste.user_id != user.id and not user.is_admin:
         return jsonify({'error': 'Unauthorized - you can only edit your own pastes'}), 403
     
-    data = request.get_json()
-    if not data:
+    try:
+        data, upload = read_paste_request(request)
+    except UploadTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    if not data and upload is None:
         return jsonify({'error': 'Invalid input'}), 400
+    if 'version' in data and data['version'] != paste.version:
+        if upload is not None:
+            upload.close()
+        return jsonify({'error': 'Paste was modified', 'version': paste.version}), 409
     
+    previous = (paste.title, paste.content)
     if 'title' in data:
         paste.title = data['title']
-    if 'content' in data:
-        paste.content = data['content']
     if 'hidden' in data:
         paste.hidden = data['hidden']
+    error = set_paste_content(paste, data, upload)
+    if error:
+        db.session.rollback()
+        return error
+    if (paste.title, paste.content) != previous:
+        record_revision(paste, user.id, previous)
     
-    db.session.commit()
-    return jsonify(paste.to_dict()), 200
+    return commit_paste_update(paste, user, include_content=upload is None)
 
 
-@app.route('/api/pastes/<string:paste_id>', methods=['DELETE'])
+@bp.route('/api/pastes/<string:paste_id>', methods=['PATCH'])
+@auth_required
+def patch_paste(paste_id):
+    """Apply line range edits to a paste, if it is still at the version the client edited
+
+    Body: {"version": n, "edits": [{"start": 0, "end": 1, "text": "..."}], "title": ..., "hidden": ...}.
+    The version may also be sent as an If-Match header. Line numbers refer to
+    the content at that version; the response leaves the content out.
+    """
+    # Content is only loaded once the edit is allowed
+    paste = Paste.live().filter_by(paste_id=paste_id).first()
+    if not paste:
+        return jsonify({'error': 'Paste not found'}), 404
+    
+    user = get_current_user()
+    # Check if user owns the paste OR user is admin
+    if paste.user_id != user.id and not user.is_admin:
+        return jsonify({'error': 'Unauthorized - you can only edit your own pastes'}), 403
+    
+    data = request.get_json()
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Invalid input'}), 400
+    version = data.get('version', request.headers.get('If-Match', '').strip('"') or None)
+    try:
+        version = int(version)
+        edits = sorted(line_edit(edit) for edit in data.get('edits', []))
+    except (TypeError, ValueError, KeyError):
+        return jsonify({'error': 'Invalid input - version and edits with start/end line numbers and text are required'}), 400
+    title = data.get('title', paste.title)
+    if not isinstance(title, str) or not title.strip() or len(title) > Paste.title.type.length:
+        return jsonify({'error': f'Title must be a non-empty string of at most {Paste.title.type.length} characters'}), 400
+    if not isinstance(data.get('hidden', False), bool):
+        return jsonify({'error': 'Hidden must be true or false'}), 400
+    if version != paste.version:
+        return jsonify({'error': 'Paste was modified', 'version': paste.version}), 409
+    
+    previous = (paste.title, paste.content)
+    delta = None
+    if edits:
+        try:
+            content, delta = apply_line_edits(paste.content, edits)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        content_hash, content_size = content_digest(content)
+        if content_size > config.MAX_PASTE_SIZE:
+            return jsonify({'error': f'Paste content exceeds {config.MAX_PASTE_SIZE} bytes'}), 413
+        paste.set_content(content, content_hash, content_size)
+    paste.title = title
+    if 'hidden' in data:
+        paste.hidden = data['hidden']
+    if (paste.title, paste.content) != previous:
+        record_revision(paste, user.id, previous, delta=delta)
+    
+    return commit_paste_update(paste, user, include_content=False)
+
+
+def line_edit(edit):
+    """(start, end, text) of one PATCH edit; raises TypeError/ValueError/KeyError when malformed"""
+    if not isinstance(edit, dict):
+        raise TypeError('Edit must be an object')
+    text = edit.get('text', '')
+    if not isinstance(text, str):
+        raise TypeError('Edit text must be a string')
+    return int(edit['start']), int(edit['end']), text
+
+
+def commit_paste_update(paste, user, include_content=True):
+    """Commit an edited paste; 409 if someone else changed it since it was loaded"""
+    try:
+        db.session.commit()
+    except StaleDataError:
+        db.session.rollback()
+        return jsonify({'error': 'Paste was modified'}), 409
+    mark_write(user_id=user.id, paste_id=paste.paste_id)
+    # No-op unless the content changed to something not rendered yet
+    highlight.schedule(paste)
+    return jsonify(paste.to_dict(include_content=include_content)), 200
+
+
+@bp.route('/api/pastes/<string:paste_id>/revisions', methods=['GET'])
+@read_replica
+@optional_auth
+def get_paste_revisions(paste_id):
+    """Saved versions of a paste, newest first (without content)"""
+    paste = Paste.live().filter_by(paste_id=paste_id).first()
+    if not paste:
+        return jsonify({'error': 'Paste not found'}), 404
+    
+    user = get_current_user()
+    if paste.hidden and not (user and (user.id == paste.user_id or user.is_admin)):
+        return jsonify({'error': 'Paste is hidden'}), 403
+    return jsonify({
+        'paste_id': paste_id,
+        'revisions': [revision.to_dict() for revision in list_revisions(paste_id) or [initial_revision(paste)]],
+    }), 200
+
+
+@bp.route('/api/pastes/<string:paste_id>/revisions/<int:number>', methods=['GET'])
+@read_replica
+@optional_auth
+def get_paste_revision(paste_id, number):
+    """One saved version of a paste, content included"""
+    paste = Paste.live().filter_by(paste_id=paste_id).first()
+    if not paste:
+        return jsonify({'error': 'Paste not found'}), 404
+    
+    user = get_current_user()
+    if paste.hidden and not (user and (user.id == paste.user_id or user.is_admin)):
+        return jsonify({'error': 'Paste is hidden'}), 403
+    
+    found = get_revision(paste_id, number)
+    if not found and number == 1 and not list_revisions(paste_id):
+        found = initial_revision(paste), paste.content
+    if not found:
+        return jsonify({'error': 'Revision not found'}), 404
+    revision, content = found
+    data = revision.to_dict()
+    data['content'] = content
+    return jsonify(data), 200
+
+
+@bp.route('/api/pastes/<string:paste_id>/highlighted', methods=['GET'])
+@optional_auth
+def get_highlighted_paste(paste_id):
+    """Server-rendered syntax highlighted HTML of a paste; 202 while it is still being rendered"""
+    if not highlight.available():
+        return jsonify({'error': 'Syntax highlighting is not available'}), 501
+    requested = request.args.get('language', highlight.AUTO).lower()
+    if not highlight.is_known_language(requested):
+        return jsonify({'error': f'Unknown language: {requested}'}), 400
+    
+    paste = Paste.live().filter_by(paste_id=paste_id).first()
+    if not paste:
+        return jsonify({'error': 'Paste not found'}), 404
+    
+    user = get_current_user()
+    is_owner = user and (user.id == paste.user_id or user.is_admin)
+    if paste.hidden and not is_owner:
+        return jsonify({'error': 'Paste is hidden'}), 403
+    if (paste.content_size or 0) > config.HIGHLIGHT_MAX_SIZE:
+        return jsonify({'error': 'Paste is too large to highlight'}), 422
+    default = highlight.default_language(paste.title)
+    if requested == highlight.AUTO:
+        requested = default
+    # Every language is stored as its own rendering, so only the owner can add more
+    if requested != default and not is_owner:
+        return jsonify({'error': 'Only the owner can highlight a paste in another language'}), 403
+    
+    rendered = highlight.get_highlight(paste.content_hash, requested) if paste.content_hash else None
+    if rendered is None:
+        # Rendered by a background job, never on the request path
+        highlight.schedule(paste, requested)
+        return jsonify({'status': 'pending', 'paste_id': paste_id}), 202
+    g.cache_compressed = True
+    return jsonify({
+        'paste_id': paste_id,
+        'content_hash': rendered.content_hash,
+        'language': rendered.language,
+        'html': rendered.html,
+    }), 200
+
+
+@bp.route('/api/highlight.css', methods=['GET'])
+def get_highlight_stylesheet():
+    """Stylesheet for the HTML returned by /api/pastes/<id>/highlighted"""
+    if not highlight.available():
+        return jsonify({'error': 'Syntax highlighting is not available'}), 501
+    response = current_app.response_class(highlight.stylesheet(), mimetype='text/css')
+    response.cache_control.public = True
+    response.cache_control.max_age = 86400
+    return response
+
+
+@bp.route('/api/pastes/<string:paste_id>', methods=['DELETE'])
 @auth_required
 def delete_paste(paste_id):
     paste = Paste.query.filter_by(paste_id=paste_id).first()
@@ -90,31 +340,61 @@ def delete_paste(paste_id):
     
     db.session.delete(paste)
     db.session.commit()
+    mark_write(user_id=user.id, paste_id=paste_id)
     return jsonify({'message': 'Paste deleted successfully'}), 200
 
-@app.route('/api/user/me', methods=['GET'])
+@bp.route('/api/user/me', methods=['GET'])
 @auth_required
 def get_current_user_info():
     """Get the current user's information"""
     user = get_current_user()
     return jsonify(user.to_dict()), 200
 
-@app.route('/api/user/my-pastes', methods=['GET'])
+@bp.route('/api/user/my-pastes', methods=['GET'])
+@read_replica
 @auth_required
 def get_my_pastes():
     """Get all pastes created by the current user"""
     user = get_current_user()
     # Return pastes ordered by most recently updated first so recent activity appears at the top
     pastes = (
-        Paste.query
+        Paste.with_content()
+        .filter(Paste.unexpired())
         .filter_by(user_id=user.id)
         .order_by(Paste.updated_at.desc(), Paste.created_at.desc())
         .all()
     )
     return jsonify([paste.to_dict() for paste in pastes]), 200
 
+@bp.route('/api/user/export', methods=['GET'])
+@read_replica
+@auth_required
+def export_my_pastes():
+    """Stream the current user's pastes as NDJSON, one paste per line"""
+    user = get_current_user()
+    return ndjson_response(export_pastes(user.id), f'snipserve-{user.username}.ndjson')
+
+@bp.route('/api/user/import', methods=['POST'])
+@auth_required
+def import_my_pastes():
+    """Create pastes owned by the current user from an NDJSON body (as produced by the export)"""
+    # The body is read line by line, so it may be far larger than a regular request
+    request.max_content_length = config.MAX_IMPORT_SIZE
+    user = get_current_user()
+    summary = import_pastes(request.stream, owner_id=user.id)
+    mark_write(user_id=user.id)
+    return jsonify(summary), 200
+
+def ndjson_response(lines, filename):
+    """Streamed NDJSON download; lines are generated while the response is sent"""
+    return current_app.response_class(
+        stream_with_context(lines),
+        mimetype='application/x-ndjson',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+    )
+
 # Keep existing session-based routes
-@app.route('/api/user/login', methods=['POST'])
+@bp.route('/api/user/login', methods=['POST'])
 def login_user_route():
     """Log in a user with username and password"""
     data = request.get_json()
@@ -122,13 +402,13 @@ def login_user_route():
         return jsonify({'error': 'Invalid input'}), 400
     
     user = User.query.filter_by(username=data['username']).first()
-    if not user or not bcrypt.check_password_hash(user.password_hash, data['password']):
+    if not user or user.is_disabled or not bcrypt.check_password_hash(user.password_hash, data['password']):
         return jsonify({'error': 'Invalid credentials'}), 401
     
     login_user(user)
     return jsonify({'message': 'Logged in successfully', 'api_key': user.api_key}), 200
 
-@app.route('/api/user/register', methods=['POST'])
+@bp.route('/api/user/register', methods=['POST'])
 def register_user():
     """Register a new user"""
     data = request.get_json()
@@ -150,9 +430,10 @@ def register_user():
     # API Key is generated and only shown once during registration
     login_user(new_user)
     session['user_id'] = new_user.id  # Store user ID in session
+    mark_write(user_id=new_user.id, api_key=api_key)
     return jsonify({'message': 'User registered successfully', 'api_key': api_key}), 201
 
-@app.route('/api/user/logout', methods=['POST'])
+@bp.route('/api/user/logout', methods=['POST'])
 @login_required
 def logout_user_route():
     """Log out the current user"""
@@ -161,30 +442,34 @@ def logout_user_route():
 
 @login_manager.user_loader
 def load_user(user_id):
-    """Load user by ID for Flask-Login"""
-    return User.query.get(int(user_id))
+    """Load user by ID for Flask-Login, through the user identity cache"""
+    return load_user_identity(int(user_id))
 
 def generate_api_key():
     """Generate a unique API key for the user"""
     return secrets.token_hex(32)  # 64-character hex string
 
-@app.route('/api/user/api-key', methods=['GET'])
+@bp.route('/api/user/api-key', methods=['GET'])
 @login_required
 def get_api_key():
     """Get the current user's API key (without regenerating)"""
     user = get_current_user()
     return jsonify({'api_key': user.api_key}), 200
 
-@app.route('/api/user/api-key/regenerate', methods=['POST'])  
+@bp.route('/api/user/api-key/regenerate', methods=['POST'])  
 @login_required
 def regenerate_api_key():
     """Generate a new API key for the current user"""
-    user = get_current_user()
+    user = db.session.get(User, get_current_user().id)
+    old_api_key = user.api_key
     user.api_key = generate_api_key()
     db.session.commit()
+    invalidate_user(user.id, old_api_key)
+    mark_write(user_id=user.id, api_key=user.api_key)
     return jsonify({'api_key': user.api_key}), 200
 
-@app.route("/api/manage/pastes", methods=["GET"])
+@bp.route("/api/manage/pastes", methods=["GET"])
+@read_replica
 @auth_required
 def manage_pastes():
     """Get all pastes for admin management"""
@@ -192,16 +477,26 @@ def manage_pastes():
     if not user.is_admin:
         return jsonify({'error': 'Unauthorized - admin access required'}), 403
     
-    pastes = Paste.query.all()
+    pastes = Paste.with_content().filter(Paste.unexpired()).all()
     return jsonify([paste.to_dict() for paste in pastes]), 200
 
-@app.route("/api/test")
+@bp.route('/api/admin/export', methods=['GET'])
+@read_replica
+@auth_required
+def export_all_pastes():
+    """Stream every paste as NDJSON (admin only)"""
+    user = get_current_user()
+    if not user.is_admin:
+        return jsonify({'error': 'Unauthorized - admin access required'}), 403
+    return ndjson_response(export_pastes(), 'snipserve-pastes.ndjson')
+
+@bp.route("/api/test")
 def test_route():
     """Test route to verify API is working"""
     return jsonify({'message': 'API is working'}), 200
 
 
-@app.route('/api/pastes/<string:paste_id>/views', methods=['POST', 'GET'])
+@bp.route('/api/pastes/<string:paste_id>/views', methods=['POST', 'GET'])
 def increment_view_count(paste_id):
     """Increment the view count for a paste with spam protection"""
     if request.method == 'POST':
@@ -213,7 +508,9 @@ def increment_view_count(paste_id):
 
 def increment_view_count_post(paste_id):
     """Increment view count with IP and user-based spam protection"""
-    paste = Paste.query.filter_by(paste_id=paste_id).first()
+    paste = db.session.execute(
+        select(Paste.user_id, counters.view_count_column()).where(Paste.paste_id == paste_id, Paste.unexpired())
+    ).first()
     if not paste:
         return jsonify({'error': 'Paste not found'}), 404
     
@@ -234,52 +531,31 @@ def increment_view_count_post(paste_id):
     except:
         pass  # Anonymous user
     
-    # Time threshold - only count one view per IP/user per 24 hours
-    time_threshold = datetime.utcnow() - timedelta(hours=24)
-    
-    # Check for recent views
-    query = PasteView.query.filter_by(paste_id=paste_id).filter(
-        PasteView.viewed_at > time_threshold
-    )
+    # Dedup check, view insert and counter increment happen atomically in SQL
+    try:
+        view_count = counters.record_view(paste_id, client_ip, current_user_id)
+    except Exception as e:
+        return jsonify({'error': 'Failed to update view count'}), 500
     
-    recent_view = None
-    if current_user_id:
-        # For authenticated users, check by user ID (more reliable)
-        recent_view = query.filter_by(user_id=current_user_id).first()
+    if view_count is None:
+        # Already counted for this viewer recently
+        view_count = paste.view_count
     else:
-        # For anonymous users, check by IP address
-        recent_view = query.filter_by(ip_address=client_ip, user_id=None).first()
-    
-    # Only increment if no recent view found
-    if not recent_view:
-        # Create new view record
-        new_view = PasteView(
-            paste_id=paste_id,
-            ip_address=client_ip,
-            user_id=current_user_id
-        )
-        db.session.add(new_view)
-        
-        # Increment the paste view count
-        paste.view_count = (paste.view_count or 0) + 1
-        
-        try:
-            db.session.commit()
-        except Exception as e:
-            db.session.rollback()
-            return jsonify({'error': 'Failed to update view count'}), 500
-    
-    return jsonify({'view_count': paste.view_count or 0}), 200
+        trending.record_view(paste_id)
+        trending.maybe_flush()
+    return jsonify({'view_count': view_count or 0}), 200
 
+@read_replica
 def get_view_count(paste_id):
     """Get current view count for a paste"""
-    paste = Paste.query.filter_by(paste_id=paste_id).first()
-    if not paste:
+    view_count = counters.get_view_count(paste_id)
+    if view_count is None:
         return jsonify({'error': 'Paste not found'}), 404
     
-    return jsonify({'view_count': paste.view_count or 0}), 200
+    return jsonify({'view_count': view_count}), 200
 
-@app.route('/api/admin/paste-analytics/<string:paste_id>', methods=['GET'])
+@bp.route('/api/admin/paste-analytics/<string:paste_id>', methods=['GET'])
+@read_replica
 @auth_required
 def get_paste_analytics(paste_id):
     """Get detailed view analytics for a paste (admin only)"""
@@ -304,7 +580,8 @@ def get_paste_analytics(paste_id):
     return jsonify(analytics), 200
 
 
-@app.route('/api/admin/paste-analytics', methods=['GET'])
+@bp.route('/api/admin/paste-analytics', methods=['GET'])
+@read_replica
 @auth_required
 def get_all_paste_analytics():
     """Get analytics for all pastes (admin only)"""
@@ -328,7 +605,21 @@ def get_all_paste_analytics():
     
     return jsonify(analytics), 200
 
-@app.route('/api/admin/users', methods=['GET'])
+@bp.route('/api/admin/stats', methods=['GET'])
+@auth_required
+def get_admin_stats():
+    """Get dashboard totals from the periodically refreshed stats row (admin only)"""
+    user = get_current_user()
+    if not user.is_admin:
+        return jsonify({'error': 'Unauthorized - admin access required'}), 403
+    
+    site_stats = stats.get_stats()
+    if stats.is_stale(site_stats):
+        jobs.enqueue_unique('refresh_stats')
+    return jsonify(site_stats.to_dict()), 200
+
+@bp.route('/api/admin/users', methods=['GET'])
+@read_replica
 @auth_required
 def get_all_users():
     """Get a list of all users (admin only)"""
@@ -340,7 +631,7 @@ def get_all_users():
     return jsonify([u.to_dict() for u in users]), 200
 
 
-@app.route('/api/admin/user/<string:username>', methods=['GET', 'DELETE', 'PUT'])
+@bp.route('/api/admin/user/<string:username>', methods=['GET', 'DELETE', 'PUT'])
 @auth_required
 def get_user_info(username):
     """Get, delete or update user information (admin only)"""
@@ -356,9 +647,17 @@ def get_user_info(username):
         return jsonify(target_user.to_dict()), 200
     
     elif request.method == 'DELETE':
-        db.session.delete(target_user)
+        # Lock the account out right away (its API key and sessions stop working, login
+        # is refused); cascading through thousands of pastes and views happens in the background
+        old_api_key = target_user.api_key
+        target_user.api_key = generate_api_key()
+        target_user.password_hash = DISABLED_PASSWORD_HASH
         db.session.commit()
-        return jsonify({'message': 'User deleted successfully'}), 200
+        invalidate_user(target_user.id, old_api_key)
+        # A lagging replica would still accept the old key
+        mark_write(user_id=target_user.id, api_key=old_api_key)
+        job = jobs.enqueue_unique('delete_user', user_id=target_user.id)
+        return jsonify({'message': 'User deletion queued', 'job_id': job.id}), 202
     
     elif request.method == 'PUT':
         data = request.get_json()
@@ -391,12 +690,38 @@ def get_user_info(username):
         
         try:
             db.session.commit()
+            invalidate_user(target_user.id)
+            mark_write(user_id=target_user.id, api_key=target_user.api_key)
             return jsonify(target_user.to_dict()), 200
         except Exception as e:
             db.session.rollback()
             return jsonify({'error': 'Failed to update user'}), 500
     
-@app.route('/api/admin/users', methods=['POST'])
+@bp.route('/api/admin/jobs', methods=['GET'])
+@auth_required
+def get_job_queue_stats():
+    """Get background job queue depth and status counts (admin only)"""
+    user = get_current_user()
+    if not user.is_admin:
+        return jsonify({'error': 'Unauthorized - admin access required'}), 403
+    
+    return jsonify(jobs.queue_stats()), 200
+
+
+@bp.route('/api/admin/jobs/<int:job_id>', methods=['GET'])
+@auth_required
+def get_job(job_id):
+    """Get the status of a background job (admin only)"""
+    user = get_current_user()
+    if not user.is_admin:
+        return jsonify({'error': 'Unauthorized - admin access required'}), 403
+    
+    job = db.session.get(Job, job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict()), 200
+
+@bp.route('/api/admin/users', methods=['POST'])
 @auth_required
 def create_user_admin():
     """Create a new user (admin only)"""
@@ -435,28 +760,7 @@ def create_user_admin():
         db.session.rollback()
         return jsonify({'error': 'Failed to create user'}), 500
     
-def create_default_admin():
-    db.create_all()
-    """Create a default admin user if it doesn't exist"""
-    admin_username = config.ADMIN_USERNAME
-    admin_password = config.ADMIN_PASSWORD
-    
-    if User.query.filter_by(username=admin_username).first() is None:
-        hashed_password = bcrypt.generate_password_hash(admin_password).decode('utf-8')
-        api_key = generate_api_key()
-        admin_user = User(
-            username=admin_username, 
-            password_hash=hashed_password, 
-            api_key=api_key, 
-            is_admin=True
-        )
-        db.session.add(admin_user)
-        db.session.commit()
-        print(f"Default admin user '{admin_username}' created.")
-    else:
-        print(f"Admin user '{admin_username}' already exists.")
-
-@app.route('/.well-known/assetlinks.json', methods=['GET'])
+@bp.route('/.well-known/assetlinks.json', methods=['GET'])
 def serve_assetlinks():
     """Serve Android Digital Asset Links for App Links verification"""
     data = [
@@ -473,7 +777,7 @@ def serve_assetlinks():
             }
         }
     ]
-    return app.response_class(
+    return current_app.response_class(
         response=json.dumps(data),
         status=200,
         mimetype='application/json'
@@ -0,0 +1,85 @@
+import json
+from datetime import datetime, timedelta
+from sqlalchemy import case, distinct, func, select
+from snipserve import db, config, counters
+from snipserve.models import Paste, PasteView, PasteViewShard, SiteStats, User
+
+STATS_ROW_ID = 1
+
+
+def refresh_stats():
+    """Recompute the dashboard aggregates in SQL and store them in the site_stats row"""
+    week_ago = datetime.utcnow() - timedelta(days=7)
+
+    view_count = counters.view_count_column()
+    # Ordered by the total: the most viewed pastes are the ones counting on shards
+    top = db.session.execute(
+        select(Paste.paste_id, Paste.title, view_count)
+        .order_by(view_count.desc())
+        .limit(5)
+    ).all()
+    view_stats = {}
+    if top:
+        view_stats = {
+            row.paste_id: row
+            for row in db.session.execute(
+                select(
+                    PasteView.paste_id,
+                    func.count(distinct(PasteView.ip_address)).label('unique_ips'),
+                    func.count(PasteView.user_id).label('authenticated_views'),
+                    func.sum(case((PasteView.viewed_at > week_ago, 1), else_=0)).label('recent_views'),
+                )
+                .where(PasteView.paste_id.in_([row.paste_id for row in top]))
+                .group_by(PasteView.paste_id)
+            )
+        }
+    top_pastes = [
+        {
+            'paste_id': row.paste_id,
+            'title': row.title,
+            'total_views': row.view_count,
+            'unique_ips': view_stats[row.paste_id].unique_ips if row.paste_id in view_stats else 0,
+            'authenticated_views': view_stats[row.paste_id].authenticated_views if row.paste_id in view_stats else 0,
+            'recent_views': view_stats[row.paste_id].recent_views if row.paste_id in view_stats else 0,
+        }
+        for row in top
+    ]
+    recent_users = [
+        user.to_dict()
+        for user in User.query.order_by(User.created_at.desc(), User.id.desc()).limit(5)
+    ]
+
+    stats = db.session.get(SiteStats, STATS_ROW_ID) or SiteStats(id=STATS_ROW_ID)
+    stats.user_count = db.session.execute(select(func.count(User.id))).scalar()
+    stats.paste_count = db.session.execute(select(func.count(Paste.id))).scalar()
+    stats.total_views = (
+        db.session.execute(select(func.coalesce(func.sum(Paste.view_count), 0))).scalar()
+        + db.session.execute(select(func.coalesce(func.sum(PasteViewShard.count), 0))).scalar()
+    )
+    stats.recent_views = db.session.execute(
+        select(func.count(PasteView.id)).where(PasteView.viewed_at > week_ago)
+    ).scalar()
+    stats.storage_bytes = db.session.execute(
+        # Metadata only; pastes stored before content_size existed count once
+        # `flask backfill-content-digests` has filled it in
+        select(func.coalesce(func.sum(Paste.content_size), 0))
+    ).scalar()
+    stats.top_pastes = json.dumps(top_pastes)
+    stats.recent_users = json.dumps(recent_users)
+    stats.refreshed_at = datetime.utcnow()
+    db.session.add(stats)
+    db.session.commit()
+    return stats
+
+
+def get_stats():
+    """Latest stored stats; computed inline only the very first time"""
+    stats = db.session.get(SiteStats, STATS_ROW_ID)
+    if stats is None:
+        return refresh_stats()
+    return stats
+
+
+def is_stale(stats):
+    """True if the periodic refresh hasn't run for a while (e.g. no worker running)"""
+    return datetime.utcnow() - stats.refreshed_at > timedelta(seconds=2 * config.STATS_REFRESH_INTERVAL)
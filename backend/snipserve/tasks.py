@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+from sqlalchemy import delete, select
+from snipserve import db, config, counters, highlight, stats, trending
+from snipserve.jobs import job
+from snipserve.pastes import delete_pastes, purge_expired
+from snipserve.models import Job, Paste, PasteView, User
+
+
+@job('delete_user', max_attempts=5)
+def delete_user(user_id):
+    """Delete a user with all their pastes, views and revisions, one bounded batch per transaction"""
+    batch_size = config.JOB_BATCH_SIZE
+    while True:
+        paste_ids = db.session.execute(
+            select(Paste.paste_id).where(Paste.user_id == user_id).limit(batch_size)
+        ).scalars().all()
+        if not paste_ids:
+            break
+        delete_pastes(paste_ids)
+        db.session.commit()
+
+    # Views the user left on other people's pastes
+    while True:
+        view_ids = db.session.execute(
+            select(PasteView.id).where(PasteView.user_id == user_id).limit(batch_size)
+        ).scalars().all()
+        if not view_ids:
+            break
+        db.session.execute(
+            delete(PasteView).where(PasteView.id.in_(view_ids)).execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+    db.session.execute(delete(User).where(User.id == user_id).execution_options(synchronize_session=False))
+    db.session.commit()
+
+
+@job('fold_view_counts', every=config.VIEW_COUNTER_FOLD_INTERVAL)
+def fold_view_counts():
+    """Periodically fold sharded view counters back into the paste rows"""
+    counters.fold_view_shards()
+
+
+@job('purge_expired_pastes', every=config.EXPIRED_PASTE_SWEEP_INTERVAL)
+def purge_expired_pastes():
+    """Delete pastes past their expiry"""
+    purge_expired()
+
+
+@job('refresh_stats', every=config.STATS_REFRESH_INTERVAL)
+def refresh_stats():
+    """Recompute the admin dashboard aggregates"""
+    stats.refresh_stats()
+
+
+@job('prune_trending', every=3600)
+def prune_trending():
+    """Drop trending scores that decayed to nothing"""
+    trending.prune()
+
+
+@job('highlight_paste')
+def highlight_paste(paste_id, requested='auto'):
+    """Render a paste's syntax highlighted HTML once per distinct content"""
+    highlight.render_paste(paste_id, requested)
+
+
+@job('prune_highlights', every=3600)
+def prune_highlights():
+    """Drop highlighted renderings of content no paste has anymore"""
+    highlight.prune()
+
+
+@job('prune_jobs', every=3600)
+def prune_jobs():
+    """Forget finished jobs after a day"""
+    db.session.execute(
+        delete(Job)
+        .where(Job.status == 'done', Job.finished_at < datetime.utcnow() - timedelta(days=1))
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
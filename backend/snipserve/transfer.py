@@ -0,0 +1,161 @@
+import re
+from datetime import datetime, timezone
+from flask import current_app
+from sqlalchemy import select
+from snipserve import db, config
+from snipserve.models import Paste, User
+from snipserve.pastes import parse_expiry
+from snipserve.uploads import content_digest
+
+# Paste IDs an import may keep: what generate_paste_id produces, within the column size
+PASTE_ID_PATTERN = re.compile(r'^[A-Za-z0-9]{1,10}$')
+# At most this many per-line errors are reported back
+MAX_REPORTED_ERRORS = 100
+
+
+def export_pastes(user_id=None):
+    """NDJSON lines of all pastes (or one user's), oldest first
+
+    Rows come from a server-side cursor EXPORT_BATCH_SIZE at a time and are
+    never built into ORM objects, so memory stays flat however many pastes
+    are exported.
+    """
+    stmt = (
+        select(
+            Paste.paste_id, Paste.title, Paste.content, Paste.hidden, Paste.created_at,
+            Paste.updated_at, Paste.expires_at, User.username,
+        )
+        .join(User, User.id == Paste.user_id)
+        .where(Paste.unexpired())
+        .order_by(Paste.id)
+        .execution_options(yield_per=config.EXPORT_BATCH_SIZE)
+    )
+    if user_id is not None:
+        stmt = stmt.where(Paste.user_id == user_id)
+    dumps = current_app.json.dumps
+    for row in db.session.execute(stmt):
+        yield dumps({
+            'id': row.paste_id,
+            'title': row.title,
+            'content': row.content,
+            'hidden': row.hidden,
+            'created_at': row.created_at.isoformat(),
+            'updated_at': row.updated_at.isoformat(),
+            'expires_at': row.expires_at.isoformat() if row.expires_at else None,
+            'username': row.username,
+        }) + '\n'
+
+
+def _parse_line(line, owners):
+    """Paste attributes from one NDJSON record; raises ValueError for unusable records"""
+    try:
+        record = current_app.json.loads(line)
+    except ValueError:
+        raise ValueError('Invalid JSON')
+    if not isinstance(record, dict) or not isinstance(record.get('title'), str) \
+            or not isinstance(record.get('content'), str):
+        raise ValueError('title and content are required')
+
+    owner_id = owners(record.get('username'))
+    if owner_id is None:
+        raise ValueError(f"Unknown user {record.get('username')!r}")
+    content_hash, content_size = content_digest(record['content'])
+    if content_size > config.MAX_PASTE_SIZE:
+        raise ValueError(f'Paste content exceeds {config.MAX_PASTE_SIZE} bytes')
+    paste = {
+        'paste_id': record.get('id'),
+        'title': record['title'][:255],
+        'content': (record['content'], content_hash, content_size),
+        'hidden': bool(record.get('hidden', False)),
+        'user_id': owner_id,
+    }
+    if record.get('created_at'):
+        created_at = datetime.fromisoformat(str(record['created_at']).replace('Z', '+00:00'))
+        if created_at.tzinfo is not None:
+            created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+        paste['created_at'] = created_at
+    if record.get('expires_at'):
+        # Pastes that expired in the meantime are not brought back
+        paste['expires_at'] = parse_expiry({'expires_at': record['expires_at']})
+    return paste
+
+
+def _insert_batch(batch, summary):
+    """Insert parsed pastes in one transaction, keeping their IDs unless taken or malformed"""
+    wanted = [p['paste_id'] for p in batch if isinstance(p['paste_id'], str) and PASTE_ID_PATTERN.match(p['paste_id'])]
+    taken = set(db.session.execute(select(Paste.paste_id).where(Paste.paste_id.in_(wanted))).scalars())
+    for attributes in batch:
+        original = attributes.pop('paste_id')
+        content = attributes.pop('content')
+        keep = isinstance(original, str) and PASTE_ID_PATTERN.match(original) and original not in taken
+        paste = Paste(paste_id=original if keep else None, **attributes)
+        paste.set_content(*content)
+        taken.add(paste.paste_id)
+        db.session.add(paste)
+        if not keep and original is not None:
+            summary['renamed'][str(original)] = paste.paste_id
+    db.session.commit()
+    summary['imported'] += len(batch)
+
+
+class LineTooLong(ValueError):
+    pass
+
+
+def _read_lines(source):
+    """Lines of a binary or text stream; lines over MAX_IMPORT_LINE_SIZE are skipped and yielded as LineTooLong"""
+    limit = config.MAX_IMPORT_LINE_SIZE
+    while True:
+        line = source.readline(limit + 1)
+        if not line:
+            return
+        if len(line) <= limit or line[-1:] in (b'\n', '\n'):
+            yield line
+            continue
+        # Drop the rest of the line without holding it in memory
+        while line and line[-1:] not in (b'\n', '\n'):
+            line = source.readline(limit)
+        yield LineTooLong(f'Line exceeds {limit} bytes')
+
+
+def import_pastes(source, owner_id=None):
+    """Create pastes from an NDJSON stream, IMPORT_BATCH_SIZE per transaction
+
+    With owner_id every paste goes to that user; otherwise records are
+    matched to existing users by their 'username'. Lines that can't be
+    imported are skipped and reported. Returns a summary with the import
+    count, the IDs that had to change ({old: new}) and the line errors.
+    """
+    usernames = {}
+
+    def owners(username):
+        if owner_id is not None:
+            return owner_id
+        if username not in usernames:
+            usernames[username] = db.session.execute(
+                select(User.id).where(User.username == username)
+            ).scalar()
+        return usernames[username]
+
+    summary = {'imported': 0, 'skipped': 0, 'renamed': {}, 'errors': []}
+    batch = []
+    for number, line in enumerate(_read_lines(source), start=1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+        if isinstance(line, str) and not line.strip():
+            continue
+        try:
+            if isinstance(line, LineTooLong):
+                raise line
+            batch.append(_parse_line(line, owners))
+        except (TypeError, ValueError) as e:
+            summary['skipped'] += 1
+            if len(summary['errors']) < MAX_REPORTED_ERRORS:
+                summary['errors'].append({'line': number, 'error': str(e)})
+            continue
+        if len(batch) >= config.IMPORT_BATCH_SIZE:
+            _insert_batch(batch, summary)
+            batch = []
+    if batch:
+        _insert_batch(batch, summary)
+    return summary
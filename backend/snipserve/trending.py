@@ -0,0 +1,206 @@
+import logging
+import math
+import threading
+import time
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from snipserve import db, config, counters
+from snipserve.models import Paste, TrendingScore, User
+
+logger = logging.getLogger(__name__)
+
+# A view at time t weighs 2 ** ((t - EPOCH) / TRENDING_HALF_LIFE) and a paste's score is the
+# log of its views' summed weights. Newer views outweigh older ones, scores only ever grow
+# (no periodic decay pass) and stay comparable between pastes; the log keeps them finite.
+EPOCH = 1704067200  # 2024-01-01T00:00:00Z
+# Scores whose decayed value fell below this many views are dropped
+MIN_SCORE = 0.01
+
+# Per process: scores of views not yet merged into the trending_score table (every
+# TRENDING_FLUSH_INTERVAL), and the top list reloaded from it every TRENDING_REFRESH_INTERVAL
+_lock = threading.Lock()
+_pending = {}  # paste_id -> log score of views not yet written to the table
+_board = {}  # paste_id -> best known log score, for the top pastes only
+_last_flush = time.monotonic()
+_last_refresh = None
+
+
+def view_weight(now=None):
+    """Log weight of a view happening at `now` (unix time)"""
+    now = time.time() if now is None else now
+    return (now - EPOCH) * math.log(2) / config.TRENDING_HALF_LIFE
+
+
+def log_add(a, b):
+    """log(exp(a) + exp(b)) without overflow"""
+    if a < b:
+        a, b = b, a
+    if b == -math.inf:
+        return a
+    return a + math.log1p(math.exp(b - a))
+
+
+def decayed(score, now=None):
+    """Decayed view count a log score stands for right now"""
+    return math.exp(score - view_weight(now))
+
+
+def _capacity():
+    # Room for entries that turn out hidden or expired when the feed is served
+    return config.TRENDING_SIZE * 2
+
+
+def _offer(paste_id, score):
+    """Put a paste on the top list if it belongs there (call with _lock held)"""
+    if paste_id not in _board and len(_board) >= _capacity():
+        lowest = min(_board, key=_board.get)
+        if _board[lowest] >= score:
+            return
+        del _board[lowest]
+    _board[paste_id] = score
+
+
+def record_view(paste_id, now=None):
+    """Add a counted view to the paste's score; persisted by the next flush"""
+    weight = view_weight(now)
+    with _lock:
+        _pending[paste_id] = log_add(_pending.get(paste_id, -math.inf), weight)
+        if paste_id in _board:
+            _board[paste_id] = log_add(_board[paste_id], weight)
+        else:
+            # Lower bound until the persisted score is reloaded
+            _offer(paste_id, _pending[paste_id])
+
+
+def maybe_flush():
+    """Flush pending scores if TRENDING_FLUSH_INTERVAL has passed since the last flush
+
+    Runs on the view request path after the view is committed, so a failed
+    flush is only logged; its scores stay pending for the next one.
+    """
+    if time.monotonic() - _last_flush >= config.TRENDING_FLUSH_INTERVAL:
+        try:
+            flush()
+        except Exception:
+            logger.warning('Flushing trending scores failed, retrying on the next flush', exc_info=True)
+
+
+def _restore(pending):
+    with _lock:
+        for paste_id, score in pending.items():
+            _pending[paste_id] = log_add(_pending.get(paste_id, -math.inf), score)
+
+
+def flush():
+    """Merge this process' pending scores into the trending_score table
+
+    Rows are locked in paste_id order, so concurrent flushes from other
+    workers can't deadlock. On failure the scores are put back as pending.
+    """
+    global _pending, _last_flush
+    with _lock:
+        pending, _pending = _pending, {}
+        _last_flush = time.monotonic()
+    if not pending:
+        return 0
+
+    try:
+        rows = (
+            TrendingScore.query
+            .filter(TrendingScore.paste_id.in_(pending))
+            .order_by(TrendingScore.paste_id)
+            .with_for_update()
+            .all()
+        )
+        for row in rows:
+            row.score = log_add(row.score, pending[row.paste_id])
+        missing = set(pending) - {row.paste_id for row in rows}
+        if missing:
+            # Pastes deleted since they were viewed have nothing to score
+            existing = db.session.execute(select(Paste.paste_id).where(Paste.paste_id.in_(missing))).scalars().all()
+            db.session.add_all(TrendingScore(paste_id=paste_id, score=pending[paste_id]) for paste_id in existing)
+        db.session.commit()
+    except IntegrityError:
+        # Another process inserted one of the rows first; retry on the next flush
+        db.session.rollback()
+        _restore(pending)
+        return 0
+    except BaseException:
+        db.session.rollback()
+        _restore(pending)
+        raise
+    return len(pending)
+
+
+def refresh():
+    """Reload the top list from the table, keeping local views that aren't persisted yet"""
+    global _board, _last_refresh
+    rows = db.session.execute(
+        select(TrendingScore.paste_id, TrendingScore.score)
+        .join(Paste, Paste.paste_id == TrendingScore.paste_id)
+        .where(Paste.hidden.is_(False), Paste.unexpired())
+        .order_by(TrendingScore.score.desc())
+        .limit(_capacity())
+    ).all()
+    with _lock:
+        _board = {paste_id: log_add(score, _pending.get(paste_id, -math.inf)) for paste_id, score in rows}
+        for paste_id, score in _pending.items():
+            if paste_id not in _board:
+                _offer(paste_id, score)
+        _last_refresh = time.monotonic()
+
+
+def get_trending(limit=None):
+    """Top public pastes by decayed views, best first (limit is clamped to 1..TRENDING_SIZE)"""
+    limit = config.TRENDING_SIZE if limit is None else max(1, min(limit, config.TRENDING_SIZE))
+    if _last_refresh is None or time.monotonic() - _last_refresh >= config.TRENDING_REFRESH_INTERVAL:
+        refresh()
+    with _lock:
+        ranked = sorted(_board.items(), key=lambda item: item[1], reverse=True)
+
+    # Hidden or expired pastes may still be on the list between refreshes
+    pastes = {
+        row.paste_id: row
+        for row in db.session.execute(
+            select(Paste.paste_id, Paste.title, Paste.created_at, counters.view_count_column(), User.username)
+            .join(User, User.id == Paste.user_id)
+            .where(Paste.paste_id.in_([paste_id for paste_id, _ in ranked]), Paste.hidden.is_(False), Paste.unexpired())
+        )
+    }
+    now = time.time()
+    trending = []
+    for paste_id, score in ranked:
+        row = pastes.get(paste_id)
+        if row is None:
+            continue
+        trending.append({
+            'id': paste_id,
+            'title': row.title,
+            'username': row.username,
+            'created_at': row.created_at.isoformat(),
+            'view_count': row.view_count,
+            'score': round(decayed(score, now), 3),
+        })
+        if len(trending) == limit:
+            break
+    return trending
+
+
+def prune():
+    """Drop scores that decayed to nothing; returns the number of rows removed"""
+    result = db.session.execute(
+        delete(TrendingScore)
+        .where(TrendingScore.score < view_weight() + math.log(MIN_SCORE))
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def clear():
+    """Forget this process' in-memory state (tests)"""
+    global _pending, _board, _last_refresh
+    with _lock:
+        _pending = {}
+        _board = {}
+        _last_refresh = None
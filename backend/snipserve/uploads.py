@@ -0,0 +1,111 @@
+import hashlib
+import io
+import tempfile
+from snipserve import config
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class Upload:
+    """Paste body spooled to a temporary file while it was received"""
+
+    def __init__(self, file, size, digest):
+        self.file = file
+        self.size = size
+        self.hash = digest
+
+    def read_text(self):
+        """Decode the spooled body in one pass; raises UnicodeDecodeError for non UTF-8 input"""
+        self.file.seek(0)
+        text = io.TextIOWrapper(self.file, encoding='utf-8', errors='strict', newline='')
+        try:
+            return text.read()
+        finally:
+            text.detach()
+
+    def close(self):
+        self.file.close()
+
+
+def spool_upload(stream, limit=None):
+    """Copy a request body stream chunk by chunk into a spooled temporary file
+
+    Bodies up to UPLOAD_SPOOL_SIZE stay in memory, larger ones go to disk. The
+    SHA-256 and size are computed as the chunks arrive and the copy stops as
+    soon as the body exceeds `limit` bytes.
+    """
+    limit = config.MAX_PASTE_SIZE if limit is None else limit
+    spool = tempfile.SpooledTemporaryFile(max_size=config.UPLOAD_SPOOL_SIZE)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        while True:
+            chunk = stream.read(config.UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > limit:
+                raise UploadTooLarge(f'Paste content exceeds {limit} bytes')
+            digest.update(chunk)
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    return Upload(spool, size, digest.hexdigest())
+
+
+def content_digest(content):
+    """Hash and UTF-8 size of content that arrived already decoded (JSON bodies)"""
+    data = content.encode('utf-8')
+    return hashlib.sha256(data).hexdigest(), len(data)
+
+
+RAW_MIMETYPES = ('text/plain', 'application/octet-stream')
+
+
+def _flag(value):
+    return value is not None and value.lower() in ('1', 'true', 'yes', 'on')
+
+
+def read_paste_request(request):
+    """Fields of a paste create/update request and its spooled content
+
+    Returns (data, upload). JSON bodies are parsed as before and carry the
+    content in data. Raw text/plain bodies are streamed, with title, hidden
+    and expires_in taken from the X-Paste-Title/X-Paste-Hidden/
+    X-Paste-Expires-In headers or the query string. Multipart bodies carry
+    the content in a 'content' file part and the other fields as form fields. upload is None when no content was sent
+    outside the JSON body.
+    """
+    if request.mimetype in RAW_MIMETYPES:
+        fields = request.args
+        title = request.headers.get('X-Paste-Title', fields.get('title'))
+        hidden = request.headers.get('X-Paste-Hidden', fields.get('hidden'))
+        expires_in = request.headers.get('X-Paste-Expires-In', fields.get('expires_in'))
+        # An empty raw body (e.g. a title-only update) carries no content
+        stream = request.stream if request.content_length != 0 else None
+    elif request.mimetype == 'multipart/form-data':
+        fields = request.form
+        title = fields.get('title')
+        hidden = fields.get('hidden')
+        expires_in = fields.get('expires_in')
+        file = request.files.get('content')
+        stream = file.stream if file else None
+        if stream is None and 'content' in fields:
+            stream = io.BytesIO(fields['content'].encode('utf-8'))
+    else:
+        return request.get_json(), None
+
+    data = {}
+    if title is not None:
+        data['title'] = title
+    if hidden is not None:
+        data['hidden'] = _flag(hidden)
+    if expires_in is not None:
+        data['expires_in'] = expires_in
+    if 'expires_at' in fields:
+        data['expires_at'] = fields['expires_at']
+    upload = spool_upload(stream) if stream is not None else None
+    return data, upload
@@ -0,0 +1,4 @@
+"""WSGI entry point: `gunicorn snipserve.wsgi:app` (see gunicorn.conf.py)"""
+from snipserve import create_app
+
+app = create_app()
@@ -0,0 +1,68 @@
+import os
+import tempfile
+
+import pytest
+
+# Point the app at a throwaway SQLite file before snipserve is imported
+_db_dir = tempfile.mkdtemp(prefix='snipserve-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+# Tests run background jobs explicitly with jobs.run_pending()
+os.environ['JOB_WORKER_INPROCESS'] = 'false'
+# Highlight jobs would crowd the job queue tests; test_highlight.py turns it back on
+os.environ['HIGHLIGHT_ENABLED'] = 'false'
+
+from snipserve import create_app, db, trending
+from snipserve.cache import clear_caches
+from snipserve.models import User
+
+
+@pytest.fixture(scope='session')
+def flask_app():
+    return create_app({'TESTING': True})
+
+
+@pytest.fixture
+def app(flask_app):
+    with flask_app.app_context():
+        db.create_all()
+    yield flask_app
+    with flask_app.app_context():
+        db.session.remove()
+        db.drop_all()
+    # IDs, API keys and paste IDs are reused by the next test's fresh database
+    clear_caches()
+    trending.clear()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(app):
+    """Create a user and return its API key"""
+    def _make_user(username, is_admin=False):
+        with app.app_context():
+            user = User(username=username, password_hash='x', api_key=f'key-{username}', is_admin=is_admin)
+            db.session.add(user)
+            db.session.commit()
+            return user.api_key
+    return _make_user
+
+
+@pytest.fixture
+def make_paste(app, client, make_user):
+    """Create a paste owned by a fresh user and return its public ID"""
+    def _make_paste(content='print("hello")', hidden=False, owner='owner'):
+        with app.app_context():
+            user = User.query.filter_by(username=owner).first()
+        api_key = user.api_key if user else make_user(owner)
+        response = client.post(
+            '/api/pastes/create',
+            json={'title': 'Test paste', 'content': content, 'hidden': hidden},
+            headers={'X-API-Key': api_key},
+        )
+        assert response.status_code == 201
+        return response.get_json()['id']
+    return _make_paste
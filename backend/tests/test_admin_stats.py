@@ -0,0 +1,72 @@
+from sqlalchemy import select, update
+from snipserve import config, db, jobs, pastes
+from snipserve.models import Paste
+
+
+def test_admin_stats(app, client, make_user, make_paste):
+    admin_key = make_user('admin', is_admin=True)
+    paste_id = make_paste(content='x' * 100, owner='carol')
+    make_paste(content='y' * 50, owner='carol')
+    client.post(f'/api/pastes/{paste_id}/views', headers={'X-Forwarded-For': '10.4.0.1'})
+    client.post(f'/api/pastes/{paste_id}/views', headers={'X-Forwarded-For': '10.4.0.2'})
+
+    assert client.get('/api/admin/stats', headers={'X-API-Key': 'key-carol'}).status_code == 403
+
+    stats = client.get('/api/admin/stats', headers={'X-API-Key': admin_key}).get_json()
+    assert stats['total_users'] == 2
+    assert stats['total_pastes'] == 2
+    assert stats['total_views'] == 2
+    assert stats['recent_activity'] == 2
+    assert stats['storage_bytes'] == 150
+    assert stats['top_pastes'][0]['paste_id'] == paste_id
+    assert stats['top_pastes'][0]['unique_ips'] == 2
+    assert [u['username'] for u in stats['recent_users']] == ['carol', 'admin']
+
+    # Served from the stored row until the periodic job refreshes it
+    make_paste(owner='carol')
+    assert client.get('/api/admin/stats', headers={'X-API-Key': admin_key}).get_json()['total_pastes'] == 2
+    with app.app_context():
+        jobs.enqueue('refresh_stats')
+        jobs.run_pending()
+    assert client.get('/api/admin/stats', headers={'X-API-Key': admin_key}).get_json()['total_pastes'] == 3
+
+
+def test_storage_counts_backfilled_sizes(app, client, make_user, make_paste):
+    admin_key = make_user('admin', is_admin=True)
+    paste_id = make_paste(content='z' * 40)
+    with app.app_context():
+        # A paste stored before content hashes and sizes were recorded
+        db.session.execute(update(Paste).values(content_hash=None, content_size=None, updated_at=Paste.updated_at))
+        db.session.commit()
+        version, updated_at = db.session.execute(select(Paste.version, Paste.updated_at)).one()
+        jobs.enqueue('refresh_stats')
+        jobs.run_pending()
+    assert client.get('/api/admin/stats', headers={'X-API-Key': admin_key}).get_json()['storage_bytes'] == 0
+
+    with app.app_context():
+        assert pastes.backfill_content_digests(batch_size=1) == 1
+        paste = Paste.query.filter_by(paste_id=paste_id).one()
+        assert (paste.content_size, paste.version, paste.updated_at) == (40, version, updated_at)
+        assert paste.content_hash is not None
+        jobs.enqueue('refresh_stats')
+        jobs.run_pending()
+    assert client.get('/api/admin/stats', headers={'X-API-Key': admin_key}).get_json()['storage_bytes'] == 40
+
+
+def test_top_pastes_include_sharded_counts(app, client, make_user, make_paste, monkeypatch):
+    monkeypatch.setattr(config, 'HOT_PASTE_VIEWS_PER_MINUTE', 2)
+    admin_key = make_user('admin', is_admin=True)
+    hot = make_paste()
+    for _ in range(5):
+        make_paste()
+    with app.app_context():
+        db.session.execute(update(Paste).where(Paste.paste_id != hot).values(view_count=3))
+        db.session.commit()
+    for i in range(10):
+        client.post(f'/api/pastes/{hot}/views', headers={'X-Forwarded-For': f'10.6.0.{i}'})
+
+    with app.app_context():
+        jobs.enqueue('refresh_stats')
+        jobs.run_pending()
+    top = client.get('/api/admin/stats', headers={'X-API-Key': admin_key}).get_json()['top_pastes']
+    assert top[0]['paste_id'] == hot and top[0]['total_views'] == 10
@@ -0,0 +1,70 @@
+from sqlalchemy import event
+from snipserve import db
+
+
+def count_queries(app, fn):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = fn()
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    return response, statements
+
+
+def register(client, username):
+    response = client.post('/api/user/register', json={
+        'username': username, 'password': 'secret123', 'invite_code': 'test',
+    })
+    assert response.status_code == 201
+    return response.get_json()['api_key']
+
+
+def test_warm_session_request_needs_no_queries(app, client):
+    register(client, 'dave')
+    assert client.get('/api/user/me').status_code == 200
+
+    response, statements = count_queries(app, lambda: client.get('/api/user/me'))
+    assert response.get_json()['username'] == 'dave'
+    assert statements == []
+
+
+def test_warm_api_key_request_needs_no_queries(app, client):
+    api_key = register(client, 'erin')
+    headers = {'X-API-Key': api_key}
+    assert client.get('/api/user/me', headers=headers).status_code == 200
+
+    with app.test_client() as other:
+        response, statements = count_queries(app, lambda: other.get('/api/user/me', headers=headers))
+    assert response.status_code == 200
+    assert statements == []
+
+
+def test_regenerated_api_key_invalidates_cache(client):
+    old_key = register(client, 'frank')
+    assert client.get('/api/user/me', headers={'X-API-Key': old_key}).status_code == 200
+
+    new_key = client.post('/api/user/api-key/regenerate').get_json()['api_key']
+
+    with client.application.test_client() as other:
+        assert other.get('/api/user/me', headers={'X-API-Key': old_key}).status_code == 401
+        assert other.get('/api/user/me', headers={'X-API-Key': new_key}).status_code == 200
+
+
+def test_admin_update_invalidates_cache(client, make_user):
+    admin_key = make_user('admin', is_admin=True)
+    user_key = register(client, 'grace')
+    assert client.get('/api/user/me').get_json()['is_admin'] is False
+
+    with client.application.test_client() as admin:
+        response = admin.put('/api/admin/user/grace', json={'is_admin': True}, headers={'X-API-Key': admin_key})
+    assert response.status_code == 200
+
+    assert client.get('/api/user/me').get_json()['is_admin'] is True
+    assert client.get('/api/admin/users', headers={'X-API-Key': user_key}).status_code == 200
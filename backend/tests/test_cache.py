@@ -0,0 +1,134 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+from sqlalchemy import update
+from snipserve import db
+from snipserve.cache import LRUCache, MmapCache, fcntl
+from snipserve.models import Paste
+from snipserve.pastes import content_cache
+
+
+@pytest.fixture(params=['memory', 'mmap'])
+def make(request, tmp_path):
+    def _make(**kwargs):
+        if request.param == 'memory':
+            kwargs.pop('slot_size', None)
+            kwargs.pop('ways', None)
+            return LRUCache(**kwargs)
+        if fcntl is None:
+            pytest.skip('mmap cache needs fcntl')
+        return MmapCache(str(tmp_path / 'test.cache'), **kwargs)
+    return _make
+
+
+def test_get_set_delete(make):
+    cache = make(maxsize=64)
+    assert cache.get(('id', 1)) is None
+    cache.set(('id', 1), {'username': 'ivan'})
+    assert cache.get(('id', 1)) == {'username': 'ivan'}
+    cache.delete(('id', 1))
+    assert cache.get(('id', 1), 'missing') == 'missing'
+
+
+def test_ttl(make):
+    cache = make(maxsize=64, ttl=60)
+    cache.set('short', 1, ttl=0.05)
+    cache.set('long', 2)
+    time.sleep(0.1)
+    assert cache.get('short') is None
+    assert cache.get('long') == 2
+
+
+def test_least_recently_used_is_evicted(make):
+    # One bucket of four ways for the mmap backend
+    cache = make(maxsize=4, ways=4)
+    for key in range(4):
+        cache.set(key, key)
+    cache.get(0)
+    cache.set(4, 4)
+    assert cache.get(1) is None
+    assert [cache.get(key) for key in (0, 2, 3, 4)] == [0, 2, 3, 4]
+
+
+def test_clear(make):
+    cache = make(maxsize=64)
+    cache.set('a', 1)
+    cache.clear()
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+def test_mmap_oversized_values_are_not_cached(tmp_path):
+    cache = MmapCache(str(tmp_path / 'small.cache'), maxsize=8, slot_size=256)
+    cache.set('big', 'x' * 10)
+    cache.set('big', 'x' * 1000)
+    assert cache.get('big') is None
+
+
+def test_mmap_cache_dir_is_private(tmp_path, monkeypatch):
+    directory = tmp_path / 'cache'
+    MmapCache(str(directory / 'a.cache'), maxsize=8).set('a', b'\x00bytes')
+    assert directory.stat().st_mode & 0o777 == 0o700
+    assert MmapCache(str(directory / 'a.cache'), maxsize=8).get('a') == b'\x00bytes'
+
+    uid = os.getuid()
+    monkeypatch.setattr(os, 'getuid', lambda: uid + 1)
+    with pytest.raises(PermissionError):
+        MmapCache(str(directory / 'b.cache'), maxsize=8).get('a')
+
+
+def test_mmap_only_caches_plain_data(tmp_path):
+    cache = MmapCache(str(tmp_path / 'plain.cache'), maxsize=8)
+    with pytest.raises(ValueError):
+        cache.set('a', object())
+
+
+def test_mmap_resize_replaces_the_file(tmp_path):
+    path = str(tmp_path / 'resized.cache')
+    old = MmapCache(path, maxsize=8)
+    old.set('a', 1)
+    inode = os.stat(path).st_ino
+
+    new = MmapCache(path, maxsize=64)
+    assert new.get('a') is None
+    assert os.stat(path).st_ino != inode
+    # A process still mapping the old file keeps working on it
+    assert old.get('a') == 1
+
+
+def _writer(path, ready):
+    cache = MmapCache(path, maxsize=64)
+    cache.set(('paste', 'abc'), {'title': 'shared'})
+    ready.set()
+
+
+def test_mmap_is_shared_between_processes(tmp_path):
+    path = str(tmp_path / 'shared.cache')
+    context = multiprocessing.get_context('fork')
+    ready = context.Event()
+    process = context.Process(target=_writer, args=(path, ready))
+    process.start()
+    process.join(10)
+    assert ready.is_set()
+
+    assert MmapCache(path, maxsize=64).get(('paste', 'abc')) == {'title': 'shared'}
+
+
+def test_paste_rows_are_never_served_from_cache(app, client, make_paste):
+    paste_id = make_paste(content='cached body')
+    assert client.get(f'/api/pastes/{paste_id}').get_json()['content'] == 'cached body'
+    assert len(content_cache) == 1
+
+    # Changed behind this worker's back, as another worker would
+    with app.app_context():
+        db.session.execute(update(Paste).values(title='Renamed', version=Paste.version + 1))
+        db.session.commit()
+    data = client.get(f'/api/pastes/{paste_id}').get_json()
+    assert (data['title'], data['version'], data['content']) == ('Renamed', 2, 'cached body')
+
+    with app.app_context():
+        db.session.execute(update(Paste).values(hidden=True))
+        db.session.commit()
+    assert client.get(f'/api/pastes/{paste_id}').status_code == 403
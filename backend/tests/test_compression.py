@@ -0,0 +1,84 @@
+import gzip
+import json
+
+import pytest
+from flask import Response
+from snipserve import compression, config
+from snipserve.compression import ENCODERS, choose_encoding, compress_response, precompressed_cache
+
+
+@pytest.mark.parametrize('accept, expected', [
+    ([], None),
+    ([('gzip', 1)], 'gzip'),
+    ([('GZIP', 0.5)], 'gzip'),
+    ([('gzip', 0)], None),
+    ([('deflate', 1)], None),
+    ([('*', 1)], next(iter(ENCODERS))),
+    ([('*', 1), ('gzip', 0)], next((e for e in ENCODERS if e != 'gzip'), None)),
+    ([('*', 0)], None),
+])
+def test_choose_encoding(accept, expected):
+    assert choose_encoding(accept) == expected
+
+
+def test_large_json_is_compressed(client, make_paste):
+    paste_id = make_paste(content='x' * 4000)
+    response = client.get(f'/api/pastes/{paste_id}', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert json.loads(gzip.decompress(response.data))['content'] == 'x' * 4000
+
+
+def test_refused_or_missing_encoding_is_not_compressed(client, make_paste):
+    paste_id = make_paste(content='x' * 4000)
+    for headers in ({}, {'Accept-Encoding': 'gzip;q=0'}, {'Accept-Encoding': 'gzip;q=0, *;q=0'}):
+        response = client.get(f'/api/pastes/{paste_id}', headers=headers)
+        assert 'Content-Encoding' not in response.headers
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert response.get_json()['content'] == 'x' * 4000
+
+
+def test_small_responses_are_not_compressed(client, make_paste, monkeypatch):
+    paste_id = make_paste(content='tiny')
+    response = client.get(f'/api/pastes/{paste_id}', headers={'Accept-Encoding': 'gzip'})
+    assert len(response.data) < config.COMPRESS_MIN_SIZE
+    assert 'Content-Encoding' not in response.headers
+    assert 'Accept-Encoding' in response.headers['Vary']
+
+    monkeypatch.setattr(config, 'COMPRESS_MIN_SIZE', 10)
+    response = client.get(f'/api/pastes/{paste_id}', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+
+
+def test_streamed_and_passthrough_responses_are_left_alone(app):
+    body = b'{"data": "' + b'x' * 4000 + b'"}'
+    with app.test_request_context(headers={'Accept-Encoding': 'gzip'}):
+        streamed = compress_response(Response(iter([body]), mimetype='application/json'))
+        assert streamed.is_streamed
+        assert 'Content-Encoding' not in streamed.headers
+        assert b''.join(streamed.response) == body
+
+        passthrough = Response(body, mimetype='application/json', direct_passthrough=True)
+        passthrough = compress_response(passthrough)
+        assert 'Content-Encoding' not in passthrough.headers
+        assert passthrough.get_data() == body
+
+        plain = compress_response(Response(body, mimetype='application/json'))
+        assert plain.headers['Content-Encoding'] == 'gzip'
+
+
+def test_hot_pastes_reuse_compressed_bodies(client, make_paste, monkeypatch):
+    calls = []
+
+    def counting_gzip(data):
+        calls.append(len(data))
+        return gzip.compress(data)
+
+    monkeypatch.setitem(compression.ENCODERS, 'gzip', counting_gzip)
+    paste_id = make_paste(content='y' * 4000)
+    first = client.get(f'/api/pastes/{paste_id}', headers={'Accept-Encoding': 'gzip'})
+    second = client.get(f'/api/pastes/{paste_id}', headers={'Accept-Encoding': 'gzip'})
+    assert second.headers['Content-Encoding'] == 'gzip'
+    assert first.data == second.data
+    assert len(calls) == 1
+    assert len(precompressed_cache) == 1
@@ -0,0 +1,61 @@
+import re
+
+from snipserve.cache import clear_caches
+from test_auth_cache import count_queries
+
+# The paste body column, but not content_hash / content_size
+CONTENT_COLUMN = re.compile(r'\bpaste\.content\b')
+
+
+def loads_content(statements):
+    return any(CONTENT_COLUMN.search(statement) for statement in statements)
+
+
+def test_metadata_requests_never_load_content(app, client, make_user, make_paste):
+    admin_key = make_user('admin', is_admin=True)
+    make_user('mallory')
+    paste_id = make_paste(content='x' * 1000)
+    make_paste(content='y' * 1000)
+    clear_caches()
+
+    # Ownership checks rejecting someone else's edit or delete
+    response, statements = count_queries(
+        app, lambda: client.put(f'/api/pastes/{paste_id}', json={'title': 'Mine'}, headers={'X-API-Key': 'key-mallory'})
+    )
+    assert response.status_code == 403 and statements and not loads_content(statements)
+    response, statements = count_queries(app, lambda: client.patch(
+        f'/api/pastes/{paste_id}', json={'version': 1, 'edits': []}, headers={'X-API-Key': 'key-mallory'}
+    ))
+    assert response.status_code == 403 and statements and not loads_content(statements)
+    response, statements = count_queries(
+        app, lambda: client.delete(f'/api/pastes/{paste_id}', headers={'X-API-Key': 'key-mallory'})
+    )
+    assert response.status_code == 403 and statements and not loads_content(statements)
+
+    # View counting
+    response, statements = count_queries(
+        app, lambda: client.post(f'/api/pastes/{paste_id}/views', headers={'X-Forwarded-For': '10.9.0.1'})
+    )
+    assert response.status_code == 200 and statements and not loads_content(statements)
+
+    # Analytics over every paste
+    response, statements = count_queries(
+        app, lambda: client.get('/api/admin/paste-analytics', headers={'X-API-Key': admin_key})
+    )
+    assert response.status_code == 200 and len(response.get_json()) == 2
+    assert statements and not loads_content(statements)
+
+    # The owner deleting their paste
+    response, statements = count_queries(
+        app, lambda: client.delete(f'/api/pastes/{paste_id}', headers={'X-API-Key': 'key-owner'})
+    )
+    assert response.status_code == 200 and not loads_content(statements)
+
+
+def test_reading_a_paste_loads_content(app, client, make_paste):
+    # Makes sure the check above would notice the body being read
+    paste_id = make_paste(content='x' * 1000)
+    clear_caches()
+    response, statements = count_queries(app, lambda: client.get(f'/api/pastes/{paste_id}'))
+    assert response.get_json()['content'] == 'x' * 1000
+    assert loads_content(statements)
@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+from snipserve import db
+from snipserve.models import Paste, PasteView
+from snipserve.pastes import purge_expired
+
+HEADERS = {'X-API-Key': 'key-owner'}
+
+
+def create(client, **fields):
+    return client.post('/api/pastes/create', headers=HEADERS, json={'title': 'T', 'content': 'c', **fields})
+
+
+def expire(app, *paste_ids):
+    with app.app_context():
+        Paste.query.filter(Paste.paste_id.in_(paste_ids)).update(
+            {Paste.expires_at: datetime.utcnow() - timedelta(seconds=1)}, synchronize_session=False
+        )
+        db.session.commit()
+
+
+def test_expiry_on_create(app, client, make_user):
+    make_user('owner')
+    response = create(client, expires_in=3600)
+    assert response.status_code == 201
+    expires_at = datetime.fromisoformat(response.get_json()['expires_at'])
+    assert timedelta(minutes=59) < expires_at - datetime.utcnow() <= timedelta(hours=1)
+
+    response = create(client, expires_at='2099-01-01T12:00:00+02:00')
+    assert response.get_json()['expires_at'] == '2099-01-01T10:00:00'
+    assert create(client).get_json()['expires_at'] is None
+
+    assert create(client, expires_in=-5).status_code == 400
+    assert create(client, expires_in=0).status_code == 400
+    response = client.post('/api/pastes/create', data=b'c', content_type='text/plain',
+                           headers={**HEADERS, 'X-Paste-Title': 'T', 'X-Paste-Expires-In': '0'})
+    assert response.status_code == 400
+    assert create(client, expires_at='2001-01-01T00:00:00').status_code == 400
+    assert create(client, expires_at='tomorrow').status_code == 400
+    assert create(client, expires_in=1e20).status_code == 400
+    assert create(client, expires_at='0001-01-01T00:00:00+01:00').status_code == 400
+
+
+def test_expired_pastes_are_not_served(app, client, make_user):
+    make_user('owner')
+    paste_id = create(client, expires_in=3600).get_json()['id']
+    expire(app, paste_id)
+
+    assert client.get(f'/api/pastes/{paste_id}').status_code == 404
+    assert client.post(f'/api/pastes/{paste_id}/views').status_code == 404
+    assert client.put(f'/api/pastes/{paste_id}', headers=HEADERS, json={'title': 'x'}).status_code == 404
+    assert client.get('/api/user/my-pastes', headers=HEADERS).get_json() == []
+
+
+def test_purge_expired_in_batches(app, client, make_user):
+    make_user('owner')
+    expired = [create(client, expires_in=60).get_json()['id'] for _ in range(5)]
+    kept = [create(client, expires_in=3600).get_json()['id'], create(client).get_json()['id']]
+    for paste_id in expired + kept:
+        assert client.post(f'/api/pastes/{paste_id}/views').status_code == 200
+    expire(app, *expired)
+
+    with app.app_context():
+        assert purge_expired(batch_size=2) == 5
+        assert sorted(paste_id for (paste_id,) in db.session.query(Paste.paste_id)) == sorted(kept)
+        assert {view.paste_id for view in PasteView.query} == set(kept)
+
+    result = app.test_cli_runner().invoke(args=['purge-expired'])
+    assert 'Purged 0 expired paste(s).' in result.output
@@ -0,0 +1,127 @@
+import pytest
+from sqlalchemy import select
+
+from snipserve import config, db, highlight, jobs
+from snipserve.models import Highlight, Job, Paste
+
+pytest.importorskip('pygments')
+
+PYTHON = '#!/usr/bin/env python3\ndef greet(name):\n    return f"hello {name}"\n\nprint(greet("world"))\n'
+
+
+@pytest.fixture(autouse=True)
+def enabled(monkeypatch):
+    monkeypatch.setattr(config, 'HIGHLIGHT_ENABLED', True)
+
+
+def test_rendered_once_per_content_off_the_request_path(app, client, make_paste):
+    make_paste(content=PYTHON)
+    copy_id = make_paste(content=PYTHON)
+    with app.app_context():
+        # Both pastes queued a job; the second finds the first one's rendering
+        assert Job.query.filter_by(kind='highlight_paste').count() == 2
+        assert jobs.run_pending() == 2
+        assert Highlight.query.count() == 1
+
+    response = client.get(f'/api/pastes/{copy_id}/highlighted')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['language'] == 'python'
+    assert '<div class="highlight">' in body['html']
+    assert '<span class="k">def</span>' in body['html']
+
+    stylesheet = client.get('/api/highlight.css')
+    assert stylesheet.mimetype == 'text/css'
+    assert '.highlight .k' in stylesheet.get_data(as_text=True)
+
+
+def test_edit_renders_new_content(app, client, make_paste):
+    paste_id = make_paste(content=PYTHON)
+    with app.app_context():
+        jobs.run_pending()
+    headers = {'X-API-Key': 'key-owner'}
+    assert client.put(f'/api/pastes/{paste_id}', json={'title': 'renamed'}, headers=headers).status_code == 200
+    with app.app_context():
+        assert jobs.run_pending() == 0
+
+    assert client.put(f'/api/pastes/{paste_id}', json={'content': 'SELECT 1;'}, headers=headers).status_code == 200
+    response = client.get(f'/api/pastes/{paste_id}/highlighted?language=sql', headers=headers)
+    assert response.status_code == 202
+    # Polling while it is queued doesn't queue it again
+    assert client.get(f'/api/pastes/{paste_id}/highlighted?language=sql', headers=headers).status_code == 202
+    with app.app_context():
+        assert jobs.run_pending() == 2  # auto-detected and sql
+    response = client.get(f'/api/pastes/{paste_id}/highlighted?language=sql', headers=headers)
+    assert response.get_json()['language'] == 'sql'
+
+
+def test_title_picks_the_language_per_paste(app, client, make_user):
+    headers = {'X-API-Key': make_user('owner')}
+    body = 'x = 1\n'
+
+    def create(title):
+        response = client.post('/api/pastes/create', json={'title': title, 'content': body}, headers=headers)
+        return response.get_json()['id']
+
+    python_id, ruby_id = create('a.py'), create('a.rb')
+    with app.app_context():
+        jobs.run_pending()
+    assert client.get(f'/api/pastes/{python_id}/highlighted').get_json()['language'] == 'python'
+    assert client.get(f'/api/pastes/{ruby_id}/highlighted').get_json()['language'] == 'ruby'
+
+    assert client.put(f'/api/pastes/{python_id}', json={'title': 'b.rb'}, headers=headers).status_code == 200
+    assert client.get(f'/api/pastes/{python_id}/highlighted').get_json()['language'] == 'ruby'
+
+
+def test_other_languages_are_owner_only(app, client, make_paste):
+    paste_id = make_paste(content=PYTHON)
+    with app.app_context():
+        jobs.run_pending()
+    assert client.get(f'/api/pastes/{paste_id}/highlighted?language=auto').status_code == 200
+    assert client.get(f'/api/pastes/{paste_id}/highlighted?language=ruby').status_code == 403
+    with app.app_context():
+        assert Job.query.filter_by(status='queued').count() == 0
+    response = client.get(f'/api/pastes/{paste_id}/highlighted?language=ruby', headers={'X-API-Key': 'key-owner'})
+    assert response.status_code == 202
+
+
+def test_highlight_errors(client, make_paste, monkeypatch):
+    paste_id = make_paste(content=PYTHON, hidden=True)
+    assert client.get(f'/api/pastes/{paste_id}/highlighted').status_code == 403
+    assert client.get(f'/api/pastes/{paste_id}/highlighted?language=klingon').status_code == 400
+    monkeypatch.setattr(config, 'HIGHLIGHT_MAX_SIZE', 10)
+    response = client.get(f'/api/pastes/{paste_id}/highlighted', headers={'X-API-Key': 'key-owner'})
+    assert response.status_code == 422
+    monkeypatch.setattr(config, 'HIGHLIGHT_ENABLED', False)
+    assert client.get(f'/api/pastes/{paste_id}/highlighted').status_code == 501
+
+
+def test_prune_drops_unused_renderings(app, client, make_paste):
+    paste_id = make_paste(content=PYTHON)
+    with app.app_context():
+        jobs.run_pending()
+    assert client.delete(f'/api/pastes/{paste_id}', headers={'X-API-Key': 'key-owner'}).status_code == 200
+    with app.app_context():
+        assert highlight.prune() == 1
+        assert Highlight.query.count() == 0
+
+
+def test_hash_backfill_leaves_version_and_updated_at(app, client, make_paste):
+    paste_id = make_paste(content=PYTHON)
+    with app.app_context():
+        Job.query.delete()
+        Paste.query.filter_by(paste_id=paste_id).update(
+            {Paste.content_hash: None, Paste.content_size: None}, synchronize_session=False
+        )
+        db.session.commit()
+        before = db.session.execute(
+            select(Paste.version, Paste.updated_at).where(Paste.paste_id == paste_id)
+        ).one()
+
+    assert client.get(f'/api/pastes/{paste_id}/highlighted').status_code == 202
+    with app.app_context():
+        assert jobs.run_pending() == 1
+        after = Paste.query.filter_by(paste_id=paste_id).one()
+        assert (after.version, after.updated_at) == tuple(before)
+        assert after.content_size == len(PYTHON)
+    assert client.get(f'/api/pastes/{paste_id}/highlighted').status_code == 200
@@ -0,0 +1,69 @@
+from snipserve import bcrypt, db, jobs
+from snipserve.models import Job, Paste, PasteView, User
+
+
+def test_user_delete_runs_in_background(app, client, make_user, make_paste):
+    admin_key = make_user('admin', is_admin=True)
+    paste_ids = [make_paste(owner='bob') for _ in range(3)]
+    client.post(f'/api/pastes/{paste_ids[0]}/views', headers={'X-Forwarded-For': '10.3.0.1'})
+
+    response = client.delete('/api/admin/user/bob', headers={'X-API-Key': admin_key})
+    assert response.status_code == 202
+    job_id = response.get_json()['job_id']
+
+    stats = client.get('/api/admin/jobs', headers={'X-API-Key': admin_key}).get_json()
+    assert stats['depth'] == 1
+
+    with app.app_context():
+        assert jobs.run_pending() == 1
+        assert User.query.filter_by(username='bob').first() is None
+        assert Paste.query.count() == 0
+        assert PasteView.query.count() == 0
+
+    job = client.get(f'/api/admin/jobs/{job_id}', headers={'X-API-Key': admin_key}).get_json()
+    assert job['status'] == 'done'
+    assert job['attempts'] == 1
+
+
+def test_deleted_user_is_locked_out_before_the_job_runs(app, client, make_user, make_paste):
+    admin_key = make_user('admin', is_admin=True)
+    paste_id = make_paste(owner='bob')
+    with app.app_context():
+        user = User.query.filter_by(username='bob').first()
+        user.password_hash = bcrypt.generate_password_hash('secret-password').decode('utf-8')
+        db.session.commit()
+    session = app.test_client()
+    assert client.get('/api/user/me', headers={'X-API-Key': 'key-bob'}).status_code == 200
+    assert session.post('/api/user/login', json={'username': 'bob', 'password': 'secret-password'}).status_code == 200
+
+    job_id = client.delete('/api/admin/user/bob', headers={'X-API-Key': admin_key}).get_json()['job_id']
+    # Asking again reports the job that is already queued
+    assert client.delete('/api/admin/user/bob', headers={'X-API-Key': admin_key}).get_json()['job_id'] == job_id
+    assert client.get('/api/admin/jobs', headers={'X-API-Key': admin_key}).get_json()['depth'] == 1
+
+    # Neither the API key, the existing session nor a new login work anymore
+    assert client.get('/api/user/me', headers={'X-API-Key': 'key-bob'}).status_code == 401
+    assert session.get('/api/user/me').status_code == 401
+    assert session.delete(f'/api/pastes/{paste_id}').status_code == 401
+    assert client.post('/api/user/login', json={'username': 'bob', 'password': 'secret-password'}).status_code == 401
+
+
+def test_failing_job_is_retried_then_failed(app, monkeypatch):
+    calls = []
+
+    @jobs.job('always_fails', max_attempts=2)
+    def always_fails(**payload):
+        calls.append(payload)
+        raise RuntimeError('boom')
+
+    monkeypatch.setattr('snipserve.config.JOB_RETRY_DELAY', 0)
+    with app.app_context():
+        job_id = jobs.enqueue('always_fails', n=1).id
+        assert jobs.run_pending() == 2
+
+        job = db.session.get(Job, job_id)
+        assert job.status == 'failed'
+        assert job.attempts == 2
+        assert 'boom' in job.last_error
+    assert calls == [{'n': 1}, {'n': 1}]
+    del jobs.HANDLERS['always_fails']
@@ -0,0 +1,52 @@
+import json
+from datetime import date, datetime, time
+
+import pytest
+from snipserve.json_provider import OrjsonProvider, StdlibJSONProvider, get_json_provider_class, orjson
+
+PAYLOAD = {
+    'created_at': datetime(2024, 5, 6, 7, 8, 9, 123456),
+    'day': date(2024, 5, 6),
+    'at': time(7, 8, 9),
+    'title': 'héllo',
+    'count': 3,
+}
+EXPECTED = {
+    'created_at': '2024-05-06T07:08:09.123456',
+    'day': '2024-05-06',
+    'at': '07:08:09',
+    'title': 'héllo',
+    'count': 3,
+}
+
+providers = [StdlibJSONProvider, pytest.param(
+    OrjsonProvider, marks=pytest.mark.skipif(orjson is None, reason='orjson is not installed')
+)]
+
+
+@pytest.mark.parametrize('provider_class', providers)
+def test_datetimes_are_isoformat(flask_app, provider_class):
+    provider = provider_class(flask_app)
+    assert json.loads(provider.dumps(PAYLOAD)) == EXPECTED
+    assert provider.loads(provider.dumps(PAYLOAD)) == EXPECTED
+    with flask_app.app_context():
+        response = provider.response(PAYLOAD)
+    assert response.mimetype == 'application/json'
+    assert json.loads(response.get_data()) == EXPECTED
+
+
+@pytest.mark.skipif(orjson is None, reason='orjson is not installed')
+def test_providers_agree(flask_app):
+    stdlib, fast = StdlibJSONProvider(flask_app), OrjsonProvider(flask_app)
+    payload = {'b': [1, 2.5, None, True], 'a': {'nested': PAYLOAD['created_at']}}
+    assert json.loads(fast.dumps(payload)) == json.loads(stdlib.dumps(payload))
+    # Formatting options fall back to the stdlib encoder
+    assert fast.dumps(payload, indent=2) == stdlib.dumps(payload, indent=2)
+
+
+def test_provider_lookup():
+    assert get_json_provider_class('stdlib') is StdlibJSONProvider
+    assert get_json_provider_class('snipserve.json_provider:StdlibJSONProvider') is StdlibJSONProvider
+    assert get_json_provider_class('orjson') is (OrjsonProvider if orjson is not None else StdlibJSONProvider)
+    with pytest.raises(ValueError):
+        get_json_provider_class('simplejson')
@@ -0,0 +1,82 @@
+from snipserve.models import Paste
+from snipserve.revisions import apply_line_edits
+
+HEADERS = {'X-API-Key': 'key-owner'}
+
+
+def get(client, paste_id):
+    return client.get(f'/api/pastes/{paste_id}', headers=HEADERS).get_json()
+
+
+def test_apply_line_edits():
+    content, delta = apply_line_edits('a\nb\nc\nd\n', [(0, 0, 'start\n'), (1, 3, 'B\n'), (4, 4, 'end')])
+    assert content == 'start\na\nB\nd\nend'
+    assert delta == [['start\n'], 1, -2, ['B\n'], 1, ['end']]
+
+
+def test_patch_applies_edits_and_bumps_version(client, make_paste):
+    paste_id = make_paste(content='one\ntwo\nthree\n')
+    version = get(client, paste_id)['version']
+
+    response = client.patch(f'/api/pastes/{paste_id}', headers=HEADERS, json={
+        'version': version,
+        'edits': [{'start': 1, 'end': 2, 'text': 'TWO\n'}],
+        'title': 'Patched',
+    })
+    assert response.status_code == 200
+    body = response.get_json()
+    assert 'content' not in body
+    assert body['version'] == version + 1
+
+    paste = get(client, paste_id)
+    assert paste['content'] == 'one\nTWO\nthree\n'
+    assert paste['title'] == 'Patched'
+    assert paste['content_size'] == len('one\nTWO\nthree\n')
+    revision = client.get(f'/api/pastes/{paste_id}/revisions/2').get_json()
+    assert revision['content'] == 'one\nTWO\nthree\n'
+
+
+def test_stale_version_conflicts(client, make_paste):
+    paste_id = make_paste(content='one\ntwo\n')
+    version = get(client, paste_id)['version']
+    edit = {'version': version, 'edits': [{'start': 0, 'end': 1, 'text': 'ONE\n'}]}
+    assert client.patch(f'/api/pastes/{paste_id}', headers=HEADERS, json=edit).status_code == 200
+
+    response = client.patch(f'/api/pastes/{paste_id}', headers=HEADERS, json=edit)
+    assert response.status_code == 409
+    assert response.get_json()['version'] == version + 1
+
+    # If-Match works as well, and PUT honours an expected version too
+    response = client.patch(
+        f'/api/pastes/{paste_id}', json={'edits': []}, headers={**HEADERS, 'If-Match': f'"{version + 1}"'}
+    )
+    assert response.status_code == 200
+    response = client.put(f'/api/pastes/{paste_id}', headers=HEADERS, json={'version': version, 'content': 'x'})
+    assert response.status_code == 409
+    assert get(client, paste_id)['content'] == 'ONE\ntwo\n'
+
+
+def test_invalid_patches(client, make_paste):
+    paste_id = make_paste(content='one\ntwo\n')
+    version = get(client, paste_id)['version']
+    url = f'/api/pastes/{paste_id}'
+    assert client.patch(url, headers=HEADERS, json={'edits': []}).status_code == 400
+    overlapping = [{'start': 0, 'end': 2, 'text': ''}, {'start': 1, 'end': 2, 'text': ''}]
+    assert client.patch(url, headers=HEADERS, json={'version': version, 'edits': overlapping}).status_code == 400
+    assert client.patch(url, headers=HEADERS, json={'version': version, 'edits': ['0-1']}).status_code == 400
+    for text in (None, 5, ['a']):
+        edit = [{'start': 0, 'end': 1, 'text': text}]
+        assert client.patch(url, headers=HEADERS, json={'version': version, 'edits': edit}).status_code == 400
+    out_of_range = [{'start': 2, 'end': 5, 'text': ''}]
+    assert client.patch(url, headers=HEADERS, json={'version': version, 'edits': out_of_range}).status_code == 400
+    for fields in ({'title': None}, {'title': '  '}, {'title': 'x' * 256}, {'hidden': None}, {'hidden': 'yes'}):
+        assert client.patch(url, headers=HEADERS, json={'version': version, **fields}).status_code == 400
+    paste = get(client, paste_id)
+    assert (paste['content'], paste['title'], paste['hidden'], paste['version']) == ('one\ntwo\n', 'Test paste', False, version)
+
+
+def test_views_do_not_change_version(app, client, make_paste):
+    paste_id = make_paste()
+    assert client.post(f'/api/pastes/{paste_id}/views').status_code == 200
+    with app.app_context():
+        assert Paste.query.filter_by(paste_id=paste_id).one().version == 1
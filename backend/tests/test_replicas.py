@@ -0,0 +1,111 @@
+import shutil
+
+import pytest
+from sqlalchemy import text
+from snipserve import db, replicas, config
+
+
+@pytest.fixture
+def replica(app, tmp_path):
+    """A second SQLite file standing in for a read replica"""
+    path = tmp_path / 'replica.db'
+
+    def sync():
+        with app.app_context():
+            db.session.remove()
+            shutil.copyfile(db.engine.url.database, path)
+
+    replicas.configure([f'sqlite:///{path}'])
+    yield sync
+    replicas.configure([])
+    replicas.recent_writes.clear()
+
+
+def set_title_on_primary(app, paste_id, title):
+    """Write behind the app's back, as if another node did it (no read-your-writes marker)"""
+    with app.app_context():
+        db.session.execute(text('UPDATE paste SET title = :title WHERE paste_id = :id'), {'title': title, 'id': paste_id})
+        db.session.commit()
+
+
+def test_reads_go_to_replica(app, client, make_paste, replica):
+    paste_id = make_paste()
+    replicas.recent_writes.clear()
+    replica()
+    set_title_on_primary(app, paste_id, 'Only on primary')
+
+    with app.test_client() as anonymous:
+        assert anonymous.get(f'/api/pastes/{paste_id}').get_json()['title'] == 'Test paste'
+
+
+def test_read_your_writes_stays_on_primary(app, client, make_paste, replica):
+    paste_id = make_paste(owner='heidi')
+    replica()
+
+    response = client.put(f'/api/pastes/{paste_id}', json={'title': 'Edited'}, headers={'X-API-Key': 'key-heidi'})
+    assert response.status_code == 200
+
+    with app.test_client() as other:
+        assert other.get(f'/api/pastes/{paste_id}').get_json()['title'] == 'Edited'
+        pastes = other.get('/api/user/my-pastes', headers={'X-API-Key': 'key-heidi'}).get_json()
+        assert [paste['title'] for paste in pastes] == ['Edited']
+
+
+def test_new_paste_readable_before_replication(app, make_paste, replica):
+    replica()
+    paste_id = make_paste()
+    with app.test_client() as anonymous:
+        assert anonymous.get(f'/api/pastes/{paste_id}').status_code == 200
+
+
+def test_lagging_replica_is_skipped(app, make_paste, replica, monkeypatch):
+    paste_id = make_paste()
+    replicas.recent_writes.clear()
+    replica()
+    set_title_on_primary(app, paste_id, 'Only on primary')
+
+    monkeypatch.setattr(replicas, 'replication_lag', lambda engine: config.REPLICA_MAX_LAG_SECONDS + 1)
+    for replica_node in replicas._replicas:
+        replica_node.check()
+
+    with app.test_client() as anonymous:
+        assert anonymous.get(f'/api/pastes/{paste_id}').get_json()['title'] == 'Only on primary'
+
+
+def test_broken_replica_falls_back_to_primary(app, make_paste, tmp_path):
+    paste_id = make_paste()
+    replicas.recent_writes.clear()
+    # Reachable, but without the schema: the query itself fails
+    replicas.configure([f"sqlite:///{tmp_path / 'empty.db'}"])
+    try:
+        with app.test_client() as anonymous:
+            assert anonymous.get(f'/api/pastes/{paste_id}').status_code == 200
+        assert not replicas._replicas[0].healthy
+    finally:
+        replicas.configure([])
+
+
+def test_api_key_writes_set_no_cookie(app, client, make_paste, replica):
+    paste_id = make_paste(owner='ivan')
+    response = client.put(f'/api/pastes/{paste_id}', json={'title': 'Edited'}, headers={'X-API-Key': 'key-ivan'})
+    assert response.status_code == 200
+    assert 'Set-Cookie' not in response.headers
+
+
+def test_new_api_key_works_before_replication(app, make_user, replica):
+    admin_key = make_user('admin', is_admin=True)
+    replica()
+    with app.test_client() as browser:
+        response = browser.post(
+            '/api/user/register', json={'username': 'judy', 'password': 'secret', 'invite_code': config.INVITE_CODE}
+        )
+        api_key = response.get_json()['api_key']
+        new_key = browser.post('/api/user/api-key/regenerate').get_json()['api_key']
+    with app.test_client() as other:
+        assert other.get('/api/user/my-pastes', headers={'X-API-Key': api_key}).status_code == 401
+        assert other.get('/api/user/my-pastes', headers={'X-API-Key': new_key}).status_code == 200
+
+        assert other.get('/api/manage/pastes', headers={'X-API-Key': new_key}).status_code == 403
+        response = other.put('/api/admin/user/judy', json={'is_admin': True}, headers={'X-API-Key': admin_key})
+        assert response.status_code == 200
+        assert other.get('/api/manage/pastes', headers={'X-API-Key': new_key}).status_code == 200
@@ -0,0 +1,80 @@
+from snipserve import config
+from snipserve.models import PasteRevision
+from snipserve.revisions import apply_delta, make_delta
+
+
+def edit(client, paste_id, **fields):
+    response = client.put(f'/api/pastes/{paste_id}', json=fields, headers={'X-API-Key': 'key-owner'})
+    assert response.status_code == 200
+
+
+def test_delta_round_trip():
+    old = 'a\nb\nc\r\nd'
+    new = 'a\nB\nc\r\nd\ne\n'
+    delta = make_delta(old, new)
+    assert ''.join(apply_delta(old.splitlines(keepends=True), delta)) == new
+
+
+def test_every_revision_is_reconstructed(app, client, make_paste, monkeypatch):
+    monkeypatch.setattr(config, 'REVISION_SNAPSHOT_INTERVAL', 5)
+    lines = [f'line {i}\n' for i in range(200)]
+    versions = [''.join(lines)]
+    paste_id = make_paste(content=versions[0])
+    for i in range(12):
+        lines[i * 7] = f'edited {i}\n'
+        versions.append(''.join(lines))
+        edit(client, paste_id, content=versions[-1])
+    edit(client, paste_id, title='Renamed')
+
+    listing = client.get(f'/api/pastes/{paste_id}/revisions').get_json()['revisions']
+    assert [revision['number'] for revision in listing] == list(range(14, 0, -1))
+    assert listing[0]['title'] == 'Renamed'
+
+    for number, content in enumerate(versions, start=1):
+        revision = client.get(f'/api/pastes/{paste_id}/revisions/{number}').get_json()
+        assert revision['content'] == content
+    assert client.get(f'/api/pastes/{paste_id}/revisions/14').get_json()['content'] == versions[-1]
+    assert client.get(f'/api/pastes/{paste_id}/revisions/15').status_code == 404
+
+    with app.app_context():
+        snapshots = [r.number for r in PasteRevision.query.filter_by(paste_id=paste_id, is_snapshot=True)]
+    assert sorted(snapshots) == [1, 6, 11]
+
+
+def test_unchanged_update_adds_no_revision(client, make_paste):
+    paste_id = make_paste()
+    edit(client, paste_id, hidden=False)
+    assert len(client.get(f'/api/pastes/{paste_id}/revisions').get_json()['revisions']) == 1
+
+
+def test_original_is_stored_on_first_edit(app, client, make_paste):
+    paste_id = make_paste(content='original')
+    with app.app_context():
+        assert PasteRevision.query.filter_by(paste_id=paste_id).count() == 0
+    revision = client.get(f'/api/pastes/{paste_id}/revisions/1').get_json()
+    assert revision['content'] == 'original' and revision['user_id'] is not None
+    assert client.get(f'/api/pastes/{paste_id}/revisions/2').status_code == 404
+
+    edit(client, paste_id, content='changed')
+    with app.app_context():
+        assert PasteRevision.query.filter_by(paste_id=paste_id).count() == 2
+    assert client.get(f'/api/pastes/{paste_id}/revisions/1').get_json()['content'] == 'original'
+    assert client.get(f'/api/pastes/{paste_id}/revisions/2').get_json()['content'] == 'changed'
+
+
+def test_hidden_paste_revisions(client, make_paste, make_user):
+    paste_id = make_paste(hidden=True)
+    make_user('stranger')
+    assert client.get(f'/api/pastes/{paste_id}/revisions').status_code == 403
+    response = client.get(f'/api/pastes/{paste_id}/revisions/1', headers={'X-API-Key': 'key-stranger'})
+    assert response.status_code == 403
+    response = client.get(f'/api/pastes/{paste_id}/revisions/1', headers={'X-API-Key': 'key-owner'})
+    assert response.status_code == 200
+
+
+def test_deleting_paste_removes_revisions(app, client, make_paste):
+    paste_id = make_paste()
+    edit(client, paste_id, content='second')
+    assert client.delete(f'/api/pastes/{paste_id}', headers={'X-API-Key': 'key-owner'}).status_code == 200
+    with app.app_context():
+        assert PasteRevision.query.filter_by(paste_id=paste_id).count() == 0
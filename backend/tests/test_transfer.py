@@ -0,0 +1,88 @@
+import json
+
+from snipserve import config
+from snipserve.models import Paste
+
+
+def export(client, api_key, url='/api/user/export'):
+    response = client.get(url, headers={'X-API-Key': api_key})
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == 'application/x-ndjson'
+    return response.get_data(as_text=True)
+
+
+def test_export_streams_own_pastes(client, make_paste, make_user):
+    mine = {make_paste(content=f'paste {i}\n') for i in range(3)}
+    theirs = make_paste(owner='other')
+
+    records = [json.loads(line) for line in export(client, 'key-owner').splitlines()]
+    assert {record['id'] for record in records} == mine
+    assert records[0]['content'] == 'paste 0\n'
+    assert records[0]['username'] == 'owner'
+
+    assert client.get('/api/admin/export', headers={'X-API-Key': 'key-owner'}).status_code == 403
+    admin_export = export(client, make_user('root', is_admin=True), '/api/admin/export')
+    assert {json.loads(line)['id'] for line in admin_export.splitlines()} == mine | {theirs}
+
+
+def test_import_keeps_ids_in_batches(app, client, make_paste, make_user, monkeypatch):
+    monkeypatch.setattr(config, 'IMPORT_BATCH_SIZE', 2)
+    ids = [make_paste(content=f'paste {i}') for i in range(3)]
+    body = export(client, 'key-owner')
+    for paste_id in ids:
+        assert client.delete(f'/api/pastes/{paste_id}', headers={'X-API-Key': 'key-owner'}).status_code == 200
+
+    api_key = make_user('restorer')
+    body += 'not json\n' + json.dumps({'title': 'no content'}) + '\n'
+    body += json.dumps({'title': 'far future', 'content': 'x', 'expires_at': '0001-01-01T00:00:00+01:00'}) + '\n'
+    response = client.post(
+        '/api/user/import', data=body, content_type='application/x-ndjson', headers={'X-API-Key': api_key}
+    )
+    assert response.status_code == 200
+    summary = response.get_json()
+    assert summary['imported'] == 3
+    assert summary['renamed'] == {}
+    assert [error['line'] for error in summary['errors']] == [4, 5, 6]
+    with app.app_context():
+        restored = Paste.with_content().filter(Paste.paste_id.in_(ids)).all()
+        assert sorted(paste.content for paste in restored) == ['paste 0', 'paste 1', 'paste 2']
+        assert {paste.user.username for paste in restored} == {'restorer'}
+
+    # Importing the same file again can't reuse the IDs
+    response = client.post('/api/user/import', data=body, headers={'X-API-Key': api_key})
+    assert set(response.get_json()['renamed']) == set(ids)
+
+
+def test_cli_round_trip(app, make_paste, make_user, tmp_path):
+    make_paste(content='from the cli')
+    make_user('target')
+    path = tmp_path / 'pastes.ndjson'
+    runner = app.test_cli_runner()
+
+    result = runner.invoke(args=['export-pastes', str(path), '--user', 'owner'])
+    assert result.exit_code == 0
+    result = runner.invoke(args=['import-pastes', str(path), '--user', 'target'])
+    assert result.exit_code == 0
+    assert 'Imported 1 paste(s), 1 with a new ID, skipped 0.' in result.output
+    with app.app_context():
+        contents = [paste.content for paste in Paste.with_content().all()]
+    assert contents == ['from the cli', 'from the cli']
+
+
+def test_import_enforces_size_limits(app, client, make_user, monkeypatch):
+    api_key = make_user('restorer')
+    monkeypatch.setattr(config, 'MAX_PASTE_SIZE', 10)
+    monkeypatch.setattr(config, 'MAX_IMPORT_LINE_SIZE', 200)
+    body = ''.join(json.dumps(record) + '\n' for record in [
+        {'title': 'fits', 'content': 'x' * 10},
+        {'title': 'too big', 'content': 'é' * 6},
+        {'title': 'long line', 'content': 'x', 'padding': 'y' * 1000},
+        {'title': 'after', 'content': 'ok'},
+    ])
+    response = client.post('/api/user/import', data=body, headers={'X-API-Key': api_key})
+    summary = response.get_json()
+    assert summary['imported'] == 2
+    assert [error['line'] for error in summary['errors']] == [2, 3]
+    with app.app_context():
+        assert sorted(paste.title for paste in Paste.query) == ['after', 'fits']
@@ -0,0 +1,82 @@
+import math
+
+from sqlalchemy.exc import OperationalError
+from snipserve import config, db, trending
+from snipserve.models import Paste, TrendingScore, User
+
+
+def view(client, paste_id, viewers):
+    for i in range(viewers):
+        response = client.post(f'/api/pastes/{paste_id}/views', headers={'X-Forwarded-For': f'10.0.0.{i}'})
+        assert response.status_code == 200
+
+
+def test_scores_decay_by_half_life(monkeypatch):
+    monkeypatch.setattr(config, 'TRENDING_HALF_LIFE', 3600)
+    now = 1_800_000_000
+    score = trending.log_add(trending.view_weight(now), trending.view_weight(now - 3600))
+    assert math.isclose(trending.decayed(score, now), 1.5)
+    assert math.isclose(trending.decayed(score, now + 3600), 0.75)
+    # Far past the epoch the weights alone would overflow a float
+    assert math.isfinite(trending.log_add(trending.view_weight(now * 1000), trending.view_weight(now * 1000)))
+
+
+def test_trending_ranks_public_pastes_by_views(app, client, make_paste, monkeypatch):
+    monkeypatch.setattr(config, 'TRENDING_FLUSH_INTERVAL', 0)
+    popular = make_paste()
+    quiet = make_paste()
+    hidden = make_paste(hidden=True)
+    make_paste()  # never viewed
+    view(client, popular, 3)
+    view(client, quiet, 1)
+    view(client, hidden, 5)
+
+    response = client.get('/api/pastes/trending')
+    assert response.status_code == 200
+    pastes = response.get_json()['pastes']
+    assert [paste['id'] for paste in pastes] == [popular, quiet]
+    assert math.isclose(pastes[0]['score'], 3, rel_tol=1e-3)
+    assert client.get('/api/pastes/trending?limit=1').get_json()['pastes'][0]['id'] == popular
+    for limit in (0, -1):
+        assert [p['id'] for p in client.get(f'/api/pastes/trending?limit={limit}').get_json()['pastes']] == [popular]
+
+    # Scores were persisted, so a fresh process sees the same feed
+    with app.app_context():
+        assert {row.paste_id for row in TrendingScore.query} == {popular, quiet, hidden}
+    trending.clear()
+    assert [paste['id'] for paste in client.get('/api/pastes/trending').get_json()['pastes']] == [popular, quiet]
+
+
+def test_prune_drops_decayed_scores(app):
+    with app.app_context():
+        user = User(username='u', password_hash='x', api_key='k')
+        db.session.add(user)
+        db.session.commit()
+        old, fresh = Paste(title='old', content='', user_id=user.id), Paste(title='new', content='', user_id=user.id)
+        db.session.add_all([old, fresh])
+        db.session.flush()
+        db.session.add_all([
+            TrendingScore(paste_id=old.paste_id, score=trending.view_weight() - 100),
+            TrendingScore(paste_id=fresh.paste_id, score=trending.view_weight()),
+        ])
+        db.session.commit()
+        assert trending.prune() == 1
+        assert [row.paste_id for row in TrendingScore.query] == [fresh.paste_id]
+
+
+def test_failed_flush_keeps_the_view_and_its_score(app, client, make_paste, monkeypatch):
+    paste_id = make_paste()
+    monkeypatch.setattr(config, 'TRENDING_FLUSH_INTERVAL', 0)
+
+    def locked(*args, **kwargs):
+        raise OperationalError('INSERT INTO trending_score ...', {}, Exception('database is locked'))
+
+    with monkeypatch.context() as patched:
+        patched.setattr(db.session, 'add_all', locked)
+        response = client.post(f'/api/pastes/{paste_id}/views', headers={'X-Forwarded-For': '10.8.0.1'})
+    assert response.get_json() == {'view_count': 1}
+    with app.app_context():
+        assert TrendingScore.query.count() == 0
+        # The score was put back and goes out with the next flush
+        assert trending.flush() == 1
+        assert [row.paste_id for row in TrendingScore.query] == [paste_id]
@@ -0,0 +1,77 @@
+import hashlib
+import io
+
+import pytest
+
+from snipserve import config
+from snipserve.uploads import UploadTooLarge, spool_upload
+
+
+def test_raw_upload(client, make_user):
+    api_key = make_user('uploader')
+    body = ('line of log output ünïcode\n' * 10000).encode('utf-8')
+    response = client.post(
+        '/api/pastes/create?hidden=true',
+        data=body,
+        content_type='text/plain; charset=utf-8',
+        headers={'X-API-Key': api_key, 'X-Paste-Title': 'build.log'},
+    )
+    assert response.status_code == 201
+    created = response.get_json()
+    assert 'content' not in created
+    assert created['title'] == 'build.log'
+    assert created['hidden'] is True
+    assert created['content_size'] == len(body)
+    assert created['content_hash'] == hashlib.sha256(body).hexdigest()
+
+    paste = client.get(f"/api/pastes/{created['id']}", headers={'X-API-Key': api_key}).get_json()
+    assert paste['content'] == body.decode('utf-8')
+
+
+def test_multipart_upload(client, make_user):
+    api_key = make_user('uploader')
+    response = client.post(
+        '/api/pastes/create',
+        data={'title': 'notes', 'content': (io.BytesIO(b'a\r\nb\n'), 'notes.txt')},
+        content_type='multipart/form-data',
+        headers={'X-API-Key': api_key},
+    )
+    assert response.status_code == 201
+    paste_id = response.get_json()['id']
+    assert client.get(f'/api/pastes/{paste_id}').get_json()['content'] == 'a\r\nb\n'
+
+
+def test_raw_update_keeps_other_fields(client, make_paste):
+    paste_id = make_paste(content='old')
+    response = client.put(
+        f'/api/pastes/{paste_id}',
+        data=b'new content',
+        content_type='text/plain',
+        headers={'X-API-Key': 'key-owner'},
+    )
+    assert response.status_code == 200
+    paste = client.get(f'/api/pastes/{paste_id}').get_json()
+    assert paste['title'] == 'Test paste'
+    assert paste['content'] == 'new content'
+    assert paste['content_size'] == len(b'new content')
+
+
+def test_oversized_and_invalid_uploads_are_rejected(client, make_user, monkeypatch):
+    api_key = make_user('uploader')
+    monkeypatch.setattr(config, 'MAX_PASTE_SIZE', 1000)
+    headers = {'X-API-Key': api_key, 'X-Paste-Title': 'big'}
+    response = client.post('/api/pastes/create', data=b'x' * 1001, content_type='text/plain', headers=headers)
+    assert response.status_code == 413
+    response = client.post('/api/pastes/create', json={'title': 'big', 'content': 'x' * 1001}, headers=headers)
+    assert response.status_code == 413
+    response = client.post('/api/pastes/create', data=b'\xff\xfe', content_type='text/plain', headers=headers)
+    assert response.status_code == 400
+
+
+def test_spool_upload_stops_at_limit(monkeypatch):
+    monkeypatch.setattr(config, 'UPLOAD_CHUNK_SIZE', 4)
+    stream = io.BytesIO(b'x' * 100)
+    with pytest.raises(UploadTooLarge):
+        spool_upload(stream, limit=10)
+    # Reading stopped at the first chunk past the limit
+    assert stream.tell() == 12
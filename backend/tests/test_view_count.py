@@ -0,0 +1,74 @@
+from concurrent.futures import ThreadPoolExecutor
+
+
+def test_view_counted_once_per_viewer(client, make_paste):
+    paste_id = make_paste()
+    headers = {'X-Forwarded-For': '10.0.0.1'}
+
+    assert client.post(f'/api/pastes/{paste_id}/views', headers=headers).get_json() == {'view_count': 1}
+    assert client.post(f'/api/pastes/{paste_id}/views', headers=headers).get_json() == {'view_count': 1}
+    assert client.get(f'/api/pastes/{paste_id}/views').get_json() == {'view_count': 1}
+
+
+def test_missing_paste(client):
+    assert client.post('/api/pastes/missing/views').status_code == 404
+    assert client.get('/api/pastes/missing/views').status_code == 404
+
+
+def test_concurrent_views_are_not_lost(app, make_paste):
+    """Parallel views from distinct viewers must all be counted"""
+    paste_id = make_paste()
+    viewers = 200
+
+    def view(i):
+        with app.test_client() as client:
+            return client.post(
+                f'/api/pastes/{paste_id}/views',
+                headers={'X-Forwarded-For': f'10.1.{i // 256}.{i % 256}'},
+            ).status_code
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        statuses = list(pool.map(view, range(viewers)))
+
+    assert statuses == [200] * viewers
+    with app.test_client() as client:
+        assert client.get(f'/api/pastes/{paste_id}/views').get_json() == {'view_count': viewers}
+
+
+def test_sharded_counter_folds_back(app, client, make_paste, monkeypatch):
+    from snipserve import config, counters, db
+    from snipserve.models import Paste, PasteViewShard
+
+    monkeypatch.setattr(config, 'HOT_PASTE_VIEWS_PER_MINUTE', 5)
+    paste_id = make_paste()
+
+    for i in range(20):
+        response = client.post(f'/api/pastes/{paste_id}/views', headers={'X-Forwarded-For': f'10.2.0.{i}'})
+        assert response.get_json() == {'view_count': i + 1}
+
+    with app.app_context():
+        assert PasteViewShard.query.filter_by(paste_id=paste_id).count() == config.VIEW_COUNTER_SHARDS
+        assert counters.fold_view_shards() == 1
+        assert db.session.get(Paste, 1).view_count == 20
+        # No views since the last fold, the shards are dropped
+        assert counters.fold_view_shards() == 0
+        assert PasteViewShard.query.filter_by(paste_id=paste_id).count() == 0
+
+    # Counting falls back to the paste row once the shards are gone
+    response = client.post(f'/api/pastes/{paste_id}/views', headers={'X-Forwarded-For': '10.2.1.1'})
+    assert response.get_json() == {'view_count': 21}
+
+
+def test_unfolded_shard_counts_are_shown_everywhere(app, client, make_user, make_paste, monkeypatch):
+    from snipserve import config
+
+    monkeypatch.setattr(config, 'HOT_PASTE_VIEWS_PER_MINUTE', 2)
+    admin_key = make_user('admin', is_admin=True)
+    paste_id = make_paste()
+    for i in range(10):
+        client.post(f'/api/pastes/{paste_id}/views', headers={'X-Forwarded-For': f'10.5.0.{i}'})
+
+    assert client.get(f'/api/pastes/{paste_id}').get_json()['view_count'] == 10
+    assert client.get('/api/user/my-pastes', headers={'X-API-Key': 'key-owner'}).get_json()[0]['view_count'] == 10
+    assert client.get('/api/manage/pastes', headers={'X-API-Key': admin_key}).get_json()[0]['view_count'] == 10
+    assert client.get('/api/pastes/trending').get_json()['pastes'][0]['view_count'] == 10
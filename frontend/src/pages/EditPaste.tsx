@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { useAuth } from '@/contexts/AuthContext';
-import { api, Paste } from '@/utils/api';
+import { api, lineEdits, Paste } from '@/utils/api';
 import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
 import { Label } from '@/components/ui/label';
@@ -75,13 +75,15 @@ const EditPaste = () => {
       return;
     }
 
-    if (!id) return;
+    if (!id || !paste) return;
 
     setIsSaving(true);
     try {
-      await api.updatePaste(id, {
+      // Only the changed lines are sent, against the version that was loaded
+      await api.patchPaste(id, {
+        version: paste.version,
+        edits: lineEdits(paste.content, content.trim()),
         title: title.trim(),
-        content: content.trim(),
         hidden,
       }, apiKey || undefined);
 
@@ -2,7 +2,7 @@
 import React, { useEffect, useState } from 'react';
 import { Link } from 'react-router-dom';
 import { useAuth } from '@/contexts/AuthContext';
-import { adminApi, AdminStats, AdminUser, PasteAnalytics } from '@/utils/admin-api';
+import { adminApi, AdminStats } from '@/utils/admin-api';
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
 import { Button } from '@/components/ui/button';
 import { Badge } from '@/components/ui/badge';
@@ -26,23 +26,7 @@ const AdminDashboard = () => {
   useEffect(() => {
     const fetchStats = async () => {
       try {
-        // In a real app, you'd have a single endpoint for dashboard stats
-        // For now, we'll simulate this with multiple calls
-        const [users, analytics] = await Promise.all([
-          adminApi.getUsers(apiKey || undefined),
-          adminApi.getPasteAnalytics(undefined, apiKey || undefined) as Promise<PasteAnalytics[]>
-        ]);
-
-        const mockStats: AdminStats = {
-          total_users: users.length,
-          total_pastes: analytics.length,
-          total_views: analytics.reduce((sum, p) => sum + p.total_views, 0),
-          recent_activity: analytics.reduce((sum, p) => sum + p.recent_views, 0),
-          top_pastes: analytics.slice(0, 5),
-          recent_users: users.slice(-5).reverse(),
-        };
-
-        setStats(mockStats);
+        setStats(await adminApi.getStats(apiKey || undefined));
       } catch (error) {
         toast({
           title: 'Error',
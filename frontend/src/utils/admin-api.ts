@@ -30,8 +30,10 @@ export interface AdminStats {
   total_pastes: number;
   total_views: number;
   recent_activity: number;
+  storage_bytes: number;
   top_pastes: PasteAnalytics[];
   recent_users: AdminUser[];
+  refreshed_at: string;
 }
 
 export interface CreateUserRequest {
@@ -122,6 +124,25 @@ export const adminApi = {
     return response.json();
   },
 
+  async getStats(apiKey?: string): Promise<AdminStats> {
+    const headers: Record<string, string> = {};
+    if (apiKey) {
+      headers['X-API-Key'] = apiKey;
+    }
+
+    const response = await fetch('/api/admin/stats', {
+      headers,
+      credentials: 'include',
+    });
+
+    if (!response.ok) {
+      const error = await response.json();
+      throw new Error(error.error || 'Failed to fetch stats');
+    }
+
+    return response.json();
+  },
+
   async getPasteAnalytics(pasteId?: string, apiKey?: string): Promise<PasteAnalytics[] | PasteAnalytics> {
     const headers: Record<string, string> = {};
     if (apiKey) {
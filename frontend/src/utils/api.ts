@@ -7,14 +7,53 @@ export interface Paste {
   user_id: number;
   username: string;
   view_count?: number; // Add this field
+  version: number;
+  expires_at?: string | null; // UTC; null for pastes that never expire
 }
 
 export interface CreatePasteRequest {
   title: string;
   content: string;
   hidden?: boolean;
+  expires_in?: number; // seconds until the paste is deleted
 }
 
+export interface LineEdit {
+  start: number; // first replaced line, 0-based
+  end: number; // line after the last replaced one
+  text: string; // replacement, line endings included
+}
+
+export interface PatchPasteRequest {
+  version: number; // version the edits were made against
+  edits: LineEdit[];
+  title?: string;
+  hidden?: boolean;
+}
+
+// Same line boundaries as Python's str.splitlines(keepends=True), which the backend uses
+const LINE = /[^\n\r\v\f\x1c-\x1e\x85\u2028\u2029]*(?:\r\n|[\n\r\v\f\x1c-\x1e\x85\u2028\u2029])|[^\n\r\v\f\x1c-\x1e\x85\u2028\u2029]+$/g;
+
+const splitLines = (text: string): string[] => text.match(LINE) ?? [];
+
+// Single line range edit turning oldText into newText (common leading and trailing lines are kept)
+export const lineEdits = (oldText: string, newText: string): LineEdit[] => {
+  if (oldText === newText) return [];
+  const oldLines = splitLines(oldText);
+  const newLines = splitLines(newText);
+  let start = 0;
+  while (start < oldLines.length && start < newLines.length && oldLines[start] === newLines[start]) {
+    start++;
+  }
+  let oldEnd = oldLines.length;
+  let newEnd = newLines.length;
+  while (oldEnd > start && newEnd > start && oldLines[oldEnd - 1] === newLines[newEnd - 1]) {
+    oldEnd--;
+    newEnd--;
+  }
+  return [{ start, end: oldEnd, text: newLines.slice(start, newEnd).join('') }];
+};
+
 export const api = {
   async createPaste(data: CreatePasteRequest, apiKey?: string): Promise<Paste> {
     const headers: Record<string, string> = {
@@ -84,6 +123,31 @@ export const api = {
     return response.json();
   },
 
+  // Sends only the changed lines; fails with 'Paste was modified' if someone saved in between
+  async patchPaste(pasteId: string, data: PatchPasteRequest, apiKey?: string): Promise<Paste> {
+    const headers: Record<string, string> = {
+      'Content-Type': 'application/json',
+    };
+
+    if (apiKey) {
+      headers['X-API-Key'] = apiKey;
+    }
+
+    const response = await fetch(`/api/pastes/${pasteId}`, {
+      method: 'PATCH',
+      headers,
+      credentials: 'include',
+      body: JSON.stringify(data),
+    });
+
+    if (!response.ok) {
+      const error = await response.json();
+      throw new Error(error.error || 'Failed to update paste');
+    }
+
+    return response.json();
+  },
+
   async deletePaste(pasteId: string, apiKey?: string): Promise<void> {
     const headers: Record<string, string> = {};
 